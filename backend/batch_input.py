@@ -0,0 +1,50 @@
+"""
+Parsing of symptom-set files for /api/predict/batch.
+
+CSV: one symptom set per line, one symptom name per cell (blank cells ignored).
+JSONL: one JSON value per line, either a list of symptom names or an object
+with a "symptoms" list and an optional "id" echoed back in the results.
+"""
+import csv
+import io
+import json
+
+
+def parse_csv(text):
+    symptom_sets = []
+    for row in csv.reader(io.StringIO(text)):
+        symptoms = [cell.strip() for cell in row if cell.strip()]
+        if symptoms:
+            symptom_sets.append({"id": None, "symptoms": symptoms})
+    return symptom_sets
+
+
+def parse_jsonl(text):
+    symptom_sets = []
+    for line_number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number}: invalid JSON ({e.msg})")
+        if isinstance(value, dict):
+            symptom_sets.append({"id": value.get("id"), "symptoms": value.get("symptoms")})
+        else:
+            symptom_sets.append({"id": None, "symptoms": value})
+        symptoms = symptom_sets[-1]["symptoms"]
+        if not isinstance(symptoms, list) or not all(isinstance(s, str) for s in symptoms):
+            raise ValueError(f"Line {line_number}: expected a list of symptom names")
+    return symptom_sets
+
+
+def parse_symptom_file(raw, filename=""):
+    """Parse an uploaded CSV or JSONL file into [{"id": ..., "symptoms": [...]}, ...]."""
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("Uploaded file must be UTF-8 encoded")
+
+    if filename.lower().endswith((".jsonl", ".ndjson", ".json")):
+        return parse_jsonl(text)
+    return parse_csv(text)
@@ -0,0 +1,97 @@
+"""
+In-process micro-batching for prediction requests.
+
+Requests that arrive within a short window (or until max_batch requests are
+queued) are handed to one batch function call, so a single predict_proba pass
+serves all of them. Each caller awaits its own result.
+"""
+import asyncio
+import inspect
+from collections import Counter
+
+
+class MicroBatcher:
+    """Collects items submitted from the event loop and processes them in batches."""
+
+    def __init__(self, process_batch, max_batch=32, window_ms=2.0):
+        # process_batch(items) -> list of results in the same order (may be async)
+        self.process_batch = process_batch
+        self.max_batch = max(1, int(max_batch))
+        self.window_ms = max(0.0, float(window_ms))
+        self._pending = []
+        self._timer = None
+        # Running batch tasks; the loop only keeps weak references to tasks
+        self._tasks = set()
+        self.batch_sizes = Counter()
+        self.total_requests = 0
+
+    @property
+    def enabled(self):
+        return self.max_batch > 1 and self.window_ms > 0
+
+    async def submit(self, item):
+        """Queue one item and wait for its result."""
+        if not self.enabled:
+            self._record(1)
+            return (await self._call([item]))[0]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000.0, self.flush)
+        return await future
+
+    def flush(self):
+        """Start a batch with everything queued now instead of waiting for the window."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._record(len(batch))
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @property
+    def pending(self):
+        """Queued items plus running batches; 0 once everything submitted so far is done."""
+        return len(self._pending) + len(self._tasks)
+
+    async def _run(self, batch):
+        futures = [future for _, future in batch]
+        try:
+            results = await self._call([item for item, _ in batch])
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _call(self, items):
+        results = self.process_batch(items)
+        if inspect.isawaitable(results):
+            results = await results
+        return results
+
+    def _record(self, size):
+        self.batch_sizes[size] += 1
+        self.total_requests += size
+
+    def stats(self):
+        batches = sum(self.batch_sizes.values())
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window_ms,
+            "max_batch": self.max_batch,
+            "batches": batches,
+            "requests": self.total_requests,
+            "mean_batch_size": self.total_requests / batches if batches else 0.0,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+        }
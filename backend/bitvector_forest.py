@@ -0,0 +1,136 @@
+"""
+QuickScorer-style evaluator for forests over binary symptom features.
+
+Every symptom column is 0/1, so each split "symptom <= threshold" is decided by
+whether the symptom is present. For every symptom we precompute, per tree, the
+bitmask of leaves that become unreachable when that symptom is present (the
+leaves of the left subtree of each node it makes false). A prediction ANDs the
+masks of the symptoms in the input; the lowest surviving bit of each tree is
+its exit leaf. The work per row depends on the number of symptoms and trees,
+not on tree depth.
+"""
+import numpy as np
+
+WORD_BITS = 64
+
+
+def _leaf_ranks(left, right, root, end):
+    """
+    Left-to-right leaf rank of every node of one tree.
+
+    For a leaf this is its position among the tree's leaves; for an internal
+    node it is the rank of the first leaf in its subtree.
+    """
+    first_leaf = np.empty(end - root, dtype=np.intp)
+    rank = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        first_leaf[node - root] = rank
+        if left[node] == node:
+            rank += 1
+        else:
+            # Right pushed first so the left subtree is numbered first
+            stack.append(right[node])
+            stack.append(left[node])
+    return first_leaf, rank
+
+
+class BitvectorForest:
+    """Evaluates a CompiledForest on binary rows with per-symptom leaf bitmasks."""
+
+    def __init__(self, compiled, base_masks, symptom_trees, symptom_masks, rank_leaf):
+        self.compiled = compiled
+        self.base_masks = base_masks
+        self.symptom_trees = symptom_trees
+        self.symptom_masks = symptom_masks
+        self.rank_leaf = rank_leaf
+        self.n_trees = compiled.n_trees
+        self.n_features = compiled.n_features
+        self.n_classes = compiled.n_classes
+
+    @classmethod
+    def from_compiled(cls, compiled):
+        n_trees = compiled.n_trees
+        n_nodes = len(compiled.left)
+        tree_ends = np.append(compiled.roots[1:], n_nodes)
+
+        ranks = []
+        for tree in range(n_trees):
+            ranks.append(_leaf_ranks(compiled.left, compiled.right, compiled.roots[tree], tree_ends[tree]))
+        n_words = max(-(-n_leaves // WORD_BITS) for _, n_leaves in ranks)
+        n_bytes = n_words * (WORD_BITS // 8)
+
+        # rank_leaf[tree, rank] -> global leaf number used by compiled.leaf_values
+        rank_leaf = np.zeros((n_trees, n_words * WORD_BITS), dtype=np.intp)
+        base_masks = np.empty((n_trees, n_words), dtype=np.uint64)
+        per_symptom = [([], []) for _ in range(compiled.n_features)]
+
+        for tree, (first_leaf, n_leaves) in enumerate(ranks):
+            nodes = np.arange(compiled.roots[tree], tree_ends[tree])
+            is_leaf = compiled.left[nodes] == nodes
+            rank_leaf[tree, first_leaf[is_leaf]] = compiled.leaf_index[nodes[is_leaf]]
+
+            # A false node (x > threshold) rules out its left subtree: leaf ranks [lo, hi)
+            internal = nodes[~is_leaf]
+            lo = first_leaf[compiled.left[internal] - compiled.roots[tree]]
+            hi = first_leaf[compiled.right[internal] - compiled.roots[tree]]
+            threshold = compiled.threshold[internal]
+            feature = compiled.feature[internal]
+
+            # threshold < 0: false for 0 and 1 alike; 0 <= threshold < 1: false only when present
+            groups = np.where(threshold < 0, compiled.n_features, feature)
+            switchable = threshold < 1
+            groups, lo, hi = groups[switchable], lo[switchable], hi[switchable]
+
+            used, slot = np.unique(groups, return_inverse=True)
+            cleared = np.zeros((len(used), n_leaves + 1), dtype=np.int32)
+            np.add.at(cleared, (slot, lo), 1)
+            np.add.at(cleared, (slot, hi), -1)
+            alive = np.cumsum(cleared[:, :n_leaves], axis=1) == 0
+
+            masks = np.ones((len(used), n_words * WORD_BITS), dtype=bool)
+            masks[:, :n_leaves] = alive
+            packed = np.packbits(masks, axis=1, bitorder="little")[:, :n_bytes]
+            words = np.ascontiguousarray(packed).view("<u8").astype(np.uint64)
+
+            base_masks[tree] = ~np.uint64(0)
+            for group, mask in zip(used, words):
+                if group == compiled.n_features:
+                    base_masks[tree] = mask
+                else:
+                    per_symptom[group][0].append(tree)
+                    per_symptom[group][1].append(mask)
+
+        symptom_trees = [np.asarray(trees, dtype=np.intp) for trees, _ in per_symptom]
+        symptom_masks = [
+            np.asarray(masks, dtype=np.uint64).reshape(len(masks), n_words) for _, masks in per_symptom
+        ]
+        return cls(compiled, base_masks, symptom_trees, symptom_masks, rank_leaf)
+
+    def exit_leaves(self, columns):
+        """Global leaf numbers reached in every tree by a row with these symptoms present."""
+        alive = self.base_masks.copy()
+        for col in columns:
+            trees = self.symptom_trees[col]
+            if trees.size:
+                alive[trees] &= self.symptom_masks[col]
+
+        tree_ids = np.arange(self.n_trees)
+        word_idx = (alive != 0).argmax(axis=1)
+        word = alive[tree_ids, word_idx]
+        lowest = word & (~word + np.uint64(1))
+        # Powers of two convert to float64 exactly; frexp gives their exponent
+        bit = np.frexp(lowest.astype(np.float64))[1] - 1
+        return self.rank_leaf[tree_ids, word_idx * WORD_BITS + bit]
+
+    def apply(self, X):
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n_rows, {self.n_features}), got {X.shape}")
+        if not np.isin(X, (0, 1)).all():
+            raise ValueError("The bitvector engine only accepts binary (0/1) inputs")
+        return np.vstack([self.exit_leaves(np.flatnonzero(row)) for row in X]).reshape(len(X), self.n_trees)
+
+    def predict_proba(self, X):
+        return self.compiled.proba_from_leaves(self.apply(X))
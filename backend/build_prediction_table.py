@@ -0,0 +1,43 @@
+"""
+Precompute /api/predict results for every 1- and 2-symptom combination.
+
+Run from the backend directory after training or replacing the model:
+
+    python build_prediction_table.py
+
+The server picks the table up on its next start if it was built for the
+model version it loads; other inputs still go through live inference.
+"""
+import sys
+import time
+
+import main
+from prediction_table import PredictionTable, build_table, combinations, save_table, table_size
+
+
+def build(directory=main.PREDICTION_TABLE_DIR):
+    model = main.load_model()
+    n_symptoms = len(model.symptom_index)
+    print(f"Scoring {table_size(n_symptoms)} symptom combinations for model {model.version}...")
+    start = time.perf_counter()
+    table = build_table(model.score_batch, model.scoring_item, model.scorer, n_symptoms)
+    print(f"Scored in {time.perf_counter() - start:.1f}s")
+
+    # Every row must decode to exactly what live scoring returns
+    lookup = PredictionTable(table, model.scorer)
+    items = [model.scoring_item(columns) for columns in combinations(n_symptoms)]
+    mismatches = sum(
+        lookup.lookup(item[0], item[1]) != live
+        for item, live in zip(items, model.score_batch(items))
+    )
+    if mismatches:
+        print(f"❌ {mismatches} rows do not match live scoring; table not written")
+        return False
+
+    path = save_table(table, directory, model.version, model.symptom_index)
+    print(f"✅ Wrote {path} ({table.nbytes / 1024:.0f} KiB)")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if build(*sys.argv[1:2]) else 1)
@@ -0,0 +1,432 @@
+"""
+Prediction cache backends.
+
+TTLCache is a bounded in-process LRU with TTL expiry. SQLiteCache is a
+file-backed store shared by every worker process on the host that also
+survives restarts. TieredCache puts an in-process cache in front of a
+shared one. SharedClearCache is an in-process cache whose clear() reaches
+every process. All of them expose get/set/delete/clear/flush/stats.
+"""
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    """Rough deep size in bytes of JSON-like data (dicts, lists, strings, numbers)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+class TTLCache:
+    """
+    LRU cache bounded by entry count and approximate byte size.
+
+    Entries older than ttl_seconds are treated as missing and dropped on access.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, ttl_seconds=300, sizeof=estimate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, size, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+            while self._entries and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def delete_prefix(self, prefix):
+        """Drop every tuple key that starts with the given tuple, e.g. (model_version,)."""
+        with self._lock:
+            for key in [k for k in self._entries if isinstance(k, tuple) and k[:len(prefix)] == prefix]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def flush(self, timeout=None):
+        return True
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SQLiteCache:
+    """
+    Cache stored in a SQLite file (WAL mode), shared across processes.
+
+    Keys and values must be JSON-serializable; tuple keys are stored as lists.
+    When the table grows past max_entries the oldest writes are dropped.
+
+    Callers may be on an event loop, so no call waits on another process's
+    lock: reads give up after read_timeout and count as a miss, and writes
+    and deletes are queued for a background writer thread (write-behind),
+    which applies them in order and in batches. Sets are dropped while
+    max_pending of them are already queued.
+    """
+
+    PRUNE_EVERY = 256  # sets between size checks
+    WRITE_BATCH = 256  # queued operations applied per transaction
+
+    def __init__(self, path, max_entries=100000, ttl_seconds=None, timeout=5.0,
+                 read_timeout=0.05, max_pending=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self.read_timeout = read_timeout
+        self.max_pending = max_pending
+        self._local = threading.local()
+        self._sets_since_prune = 0
+        self._queue = queue.SimpleQueue()
+        self._pending_sets = 0
+        self._pending_lock = threading.Lock()
+        self._writer = None
+        self._writer_pid = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.dropped_writes = 0
+        conn = self._open(self.timeout)
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL, written_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_written_at ON cache (written_at)")
+        finally:
+            conn.close()
+
+    def _open(self, timeout):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _connect(self):
+        # Read connection: one per thread and per process (connections must not cross a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._open(self.read_timeout)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _key(key):
+        return json.dumps(key, separators=(",", ":"))
+
+    def get(self, key, default=None):
+        try:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (self._key(key),)
+            ).fetchone()
+        except sqlite3.Error as e:
+            # Includes "database is locked" after read_timeout: treated as a miss
+            self.errors += 1
+            print(f"Prediction cache read failed: {e}")
+            row = None
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+        with self._pending_lock:
+            if self._pending_sets >= self.max_pending:
+                self.dropped_writes += 1
+                return
+            self._pending_sets += 1
+        self._enqueue((
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, written_at) VALUES (?, ?, ?, ?)",
+            (self._key(key), json.dumps(value, separators=(",", ":")), expires_at, now),
+        ))
+
+    def delete(self, key):
+        self._enqueue(("DELETE FROM cache WHERE key = ?", (self._key(key),)))
+
+    def delete_prefix(self, prefix):
+        """Drop every tuple key that starts with the given tuple, e.g. (model_version,)."""
+        pattern = self._key(list(prefix))[:-1] + ","
+        pattern = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        self._enqueue(("DELETE FROM cache WHERE key LIKE ? ESCAPE '\\'", (pattern + "%",)))
+
+    def clear(self):
+        self._enqueue(("DELETE FROM cache", ()))
+
+    def _enqueue(self, operation):
+        # The writer thread does not survive a fork; start one in this process if needed
+        if self._writer_pid != os.getpid():
+            with self._pending_lock:
+                if self._writer_pid != os.getpid():
+                    self._writer = threading.Thread(target=self._write_loop, name="sqlite-cache-writer", daemon=True)
+                    self._writer_pid = os.getpid()
+                    self._writer.start()
+        self._queue.put(operation)
+
+    def _write_loop(self):
+        conn = None
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # Events in the batch are flush() markers, set once everything before them is written
+            operations = [operation for operation in batch if isinstance(operation, tuple)]
+            sets = sum(sql.startswith("INSERT") for sql, _ in operations)
+            try:
+                if operations:
+                    if conn is None:
+                        conn = self._open(self.timeout)
+                    self._apply(conn, operations, sets)
+            except sqlite3.Error as e:
+                self.errors += 1
+                print(f"Prediction cache write failed: {e}")
+                if conn is not None and conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            finally:
+                with self._pending_lock:
+                    self._pending_sets -= sets
+                for operation in batch:
+                    if isinstance(operation, threading.Event):
+                        operation.set()
+
+    def _apply(self, conn, operations, sets):
+        conn.execute("BEGIN IMMEDIATE")
+        for sql, params in operations:
+            conn.execute(sql, params)
+        self._sets_since_prune += sets
+        if self._sets_since_prune >= self.PRUNE_EVERY:
+            self._sets_since_prune = 0
+            self._prune(conn, time.time())
+        conn.execute("COMMIT")
+
+    def flush(self, timeout=None):
+        """Wait until every write queued so far is applied (for shutdown and scripts)."""
+        if self._writer_pid != os.getpid():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _prune(self, conn, now):
+        conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        if self.max_entries is not None:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY written_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def _count(self):
+        try:
+            return self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Prediction cache count failed: {e}")
+            return None
+
+    def __len__(self):
+        return self._count() or 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": self._count(),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "errors": self.errors,
+            "pending_writes": self._pending_sets,
+            "dropped_writes": self.dropped_writes,
+        }
+
+
+class TieredCache:
+    """An in-process L1 cache in front of a shared L2; L2 hits are copied into L1."""
+
+    def __init__(self, l1, l2):
+        self.l1 = l1
+        self.l2 = l2
+
+    def get(self, key, default=None):
+        value = self.l1.get(key)
+        if value is not None:
+            return value
+        value = self.l2.get(key)
+        if value is None:
+            return default
+        self.l1.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.l1.set(key, value)
+        self.l2.set(key, value)
+
+    def delete(self, key):
+        self.l1.delete(key)
+        self.l2.delete(key)
+
+    def delete_prefix(self, prefix):
+        self.l1.delete_prefix(prefix)
+        self.l2.delete_prefix(prefix)
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+
+    def flush(self, timeout=None):
+        return self.l2.flush(timeout)
+
+    def stats(self):
+        return {"l1": self.l1.stats(), "l2": self.l2.stats()}
+
+
+class SharedClearCache:
+    """
+    An in-process cache whose clear() empties it in every process on the host.
+
+    For values that are cheap to recompute but not JSON-serializable, or not
+    worth sharing. clear() writes a new generation token to a shared
+    SQLiteCache; get() reads the token at most every check_interval seconds
+    and drops the local entries when another process has cleared them.
+    Without a shared store clear() only reaches this process, and other
+    processes serve their entries until they expire.
+    """
+
+    def __init__(self, local, shared=None, name="cache", check_interval=1.0):
+        self.local = local
+        self.shared = shared
+        self.check_interval = check_interval
+        self._generation_key = (name, "generation")
+        self._generation = shared.get(self._generation_key) if shared is not None else None
+        self._checked_at = time.monotonic()
+        self.remote_clears = 0
+
+    def _check_generation(self):
+        if self.shared is None or time.monotonic() - self._checked_at < self.check_interval:
+            return
+        self._checked_at = time.monotonic()
+        generation = self.shared.get(self._generation_key)
+        # None is a failed read or a fresh store, not a clear
+        if generation is not None and generation != self._generation:
+            self._generation = generation
+            self.local.clear()
+            self.remote_clears += 1
+
+    def get(self, key, default=None):
+        self._check_generation()
+        return self.local.get(key, default)
+
+    def set(self, key, value):
+        self.local.set(key, value)
+
+    def delete(self, key):
+        self.local.delete(key)
+
+    def delete_prefix(self, prefix):
+        self.local.delete_prefix(prefix)
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self._generation = uuid.uuid4().hex
+            self.shared.set(self._generation_key, self._generation)
+
+    def flush(self, timeout=None):
+        return self.shared.flush(timeout) if self.shared is not None else True
+
+    def stats(self):
+        stats = self.local.stats()
+        stats.update(
+            clear_scope="all processes" if self.shared is not None else "this process only",
+            check_interval=self.check_interval if self.shared is not None else None,
+            remote_clears=self.remote_clears,
+        )
+        return stats
@@ -0,0 +1,106 @@
+"""
+Check that the appointment listing endpoints run a fixed number of SQL
+queries however many appointments there are (no query per appointment).
+
+Runs the endpoints against a throwaway SQLite database (through aiosqlite,
+like the API's async sessions):
+
+    python check_appointment_queries.py
+"""
+import os
+import sys
+import tempfile
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+import main
+import models
+from database import Base
+
+ENDPOINTS = {
+    "admin appointments": "/api/admin/appointments",
+    "user appointments": "/api/users/1/appointments",
+}
+
+
+def make_client(n_appointments, path):
+    """Test client backed by a fresh database at path with n appointments, and its query counter."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = Session()
+    users = [
+        models.User(username=f"user{i}", email=f"user{i}@example.com", full_name=f"User {i}",
+                    password="x", gender="other")
+        for i in range(1, 4)
+    ]
+    doctors = [
+        models.Doctor(name=f"Doctor {i}", specialization="General Physician", hospital="City Hospital", rating=4.5)
+        for i in range(1, 6)
+    ]
+    db.add_all(users + doctors)
+    db.flush()
+    db.add_all([
+        models.Appointment(doctor_id=doctors[i % len(doctors)].id, user_id=users[i % 2].id, message=f"Visit {i}")
+        for i in range(n_appointments)
+    ])
+    db.commit()
+    db.close()
+    engine.dispose()
+
+    # No pooling: the test client may run each request on a different event loop
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    counter = {"queries": 0}
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def count_query(*args):
+        counter["queries"] += 1
+
+    async def get_test_db():
+        async with AsyncSession() as db:
+            yield db
+
+    main.app.dependency_overrides[main.get_async_db] = get_test_db
+    return TestClient(main.app), counter
+
+
+def query_counts(n_appointments):
+    with tempfile.TemporaryDirectory() as tmp:
+        return _query_counts(n_appointments, os.path.join(tmp, "appointments.sqlite3"))
+
+
+def _query_counts(n_appointments, path):
+    client, counter = make_client(n_appointments, path)
+    counts = {}
+    for name, url in ENDPOINTS.items():
+        counter["queries"] = 0
+        response = client.get(url)
+        response.raise_for_status()
+        body = response.json()
+        # The admin list is paginated ({"items", "next_cursor"}); the user list is not
+        counts[name] = (counter["queries"], len(body["items"] if isinstance(body, dict) else body))
+    return counts
+
+
+def check_appointment_queries(sizes=(5, 50, 500)):
+    results = {n: query_counts(n) for n in sizes}
+    all_ok = True
+    for name in ENDPOINTS:
+        queries = [results[n][name][0] for n in sizes]
+        rows = [results[n][name][1] for n in sizes]
+        ok = len(set(queries)) == 1
+        all_ok &= ok
+        summary = ", ".join(f"{r} rows: {q} queries" for r, q in zip(rows, queries))
+        print(f"{'✅' if ok else '❌'} {name}: {summary}")
+    main.app.dependency_overrides.clear()
+    return all_ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_appointment_queries() else 1)
@@ -0,0 +1,80 @@
+"""
+Check that inference workers memory-map an artifact-backed model instead of
+receiving a copy of its forest arrays.
+
+Exports the production model to a throwaway artifact directory, loads a
+Predictor from it and sends it to a worker process started the way the
+inference pool starts them:
+
+    python check_artifact_sharing.py [model.pkl]
+"""
+import pickle
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from compiled_forest import CompiledForest
+from export_model_artifact import MODEL_PATH, export
+from inference_pool import mp_context
+from model_artifact import FOREST_ARRAYS
+from predictor import Predictor
+
+N_ROWS = 200
+
+
+def _forest(engine):
+    return engine if isinstance(engine, CompiledForest) else engine.compiled
+
+
+def sample_columns(predictor, seed=0):
+    rng = np.random.default_rng(seed)
+    n_symptoms = len(predictor.symptom_index)
+    return [sorted(rng.choice(n_symptoms, size=rng.integers(1, 6), replace=False).tolist()) for _ in range(N_ROWS)]
+
+
+def worker_view(predictor):
+    """Names of the forest arrays the worker does not map from a file, and its probabilities."""
+    forest = _forest(predictor.engine)
+    # An unpickled memmap is still an np.memmap, but one backed by no file
+    copied = sorted(
+        name for name in FOREST_ARRAYS
+        if not isinstance(getattr(forest, name), np.memmap) or getattr(forest, name).filename is None
+    )
+    return copied, predictor.predict_proba(sample_columns(predictor))
+
+
+def check_artifact_sharing(model_path=MODEL_PATH):
+    context = mp_context()
+    if context is None:
+        print("⚠️ The forkserver start method is not available; nothing to check")
+        return True
+
+    all_ok = True
+    with tempfile.TemporaryDirectory() as artifact_path:
+        if not export(model_path, artifact_path):
+            return False
+        for engine in ("compiled", "bitvector"):
+            predictor = Predictor.load(model_path, artifact_path=artifact_path, engine=engine)
+            size = len(pickle.dumps(predictor))
+            expected = predictor.predict_proba(sample_columns(predictor))
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                copied, probabilities = executor.submit(worker_view, predictor).result()
+
+            mapped = not copied
+            same = np.array_equal(probabilities, expected)
+            ok = mapped and same
+            all_ok &= ok
+            if ok:
+                print(f"✅ {engine}: worker maps every forest array ({size / 2 ** 20:.2f} MB pickled)")
+            elif not mapped:
+                print(f"❌ {engine}: worker holds copies of {', '.join(copied)} ({size / 2 ** 20:.2f} MB pickled)")
+            else:
+                print(f"❌ {engine}: worker probabilities differ from the parent's")
+    return all_ok
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH
+    sys.exit(0 if check_artifact_sharing(path) else 1)
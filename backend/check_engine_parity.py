@@ -0,0 +1,62 @@
+"""
+Check that the alternative inference engines return exactly the same
+probabilities as sklearn's predict_proba for the production model.
+"""
+import os
+import sys
+
+import joblib
+import numpy as np
+
+from compiled_forest import CompiledForest
+from bitvector_forest import BitvectorForest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "..", "new model", "app", "disease_model.pkl")
+
+
+def load_forest(model_path):
+    model_bundle = joblib.load(model_path)
+    model = model_bundle["model"] if isinstance(model_bundle, dict) else model_bundle
+    # Threaded predict_proba sums trees in completion order; compare against the sequential sum
+    model.n_jobs = 1
+    return model
+
+
+def random_inputs(n_features, n_rows=500, seed=42):
+    rng = np.random.default_rng(seed)
+    X = np.zeros((n_rows, n_features), dtype=np.float32)
+    for row in range(n_rows):
+        k = rng.integers(1, 8)
+        X[row, rng.choice(n_features, size=min(k, n_features), replace=False)] = 1
+    return X
+
+
+def check_engine_parity(model_path=MODEL_PATH):
+    model = load_forest(model_path)
+    X = random_inputs(model.n_features_in_)
+    expected = model.predict_proba(X)
+
+    compiled = CompiledForest.from_sklearn(model)
+    engines = {
+        "compiled": compiled,
+        "bitvector": BitvectorForest.from_compiled(compiled),
+    }
+
+    all_ok = True
+    for name, engine in engines.items():
+        batch = engine.predict_proba(X)
+        single = np.vstack([engine.predict_proba(X[i:i + 1]) for i in range(len(X))])
+        ok = np.array_equal(batch, expected) and np.array_equal(single, expected)
+        all_ok &= ok
+        if ok:
+            print(f"✅ {name}: {len(X)} rows bit-identical to sklearn")
+        else:
+            max_diff = np.abs(batch - expected).max()
+            print(f"❌ {name}: probabilities differ from sklearn (max abs diff {max_diff:.3e})")
+    return all_ok
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH
+    sys.exit(0 if check_engine_parity(path) else 1)
@@ -0,0 +1,95 @@
+"""
+Class-conditional symptom importance for tree ensembles.
+
+Mean-decrease-in-impurity importance, split by class: a node's Gini impurity
+is the sum of per-class terms p_c * (1 - p_c), so the impurity decrease of
+every split can be attributed to the classes whose terms it reduces. For each
+tree the per-class decreases are summed by split feature, negative totals are
+dropped and each class row is normalized; rows are then averaged over trees.
+Summed over classes this is the usual feature_importances_ decomposition; per
+class it says which symptoms the trees actually use to separate that disease.
+
+The result is stored as a sparse (n_classes x n_symptoms) CSR matrix in an
+.npz file next to the model, together with the class and symptom names it is
+aligned to.
+"""
+import os
+
+import numpy as np
+from scipy import sparse
+
+CLASS_IMPORTANCE_FILE = "class_importance.npz"
+# Entries below this are dropped from the stored matrix; the scorer only uses
+# importances above scoring.IMPORTANCE_THRESHOLD (0.01) anyway
+MIN_STORED_IMPORTANCE = 0.001
+
+
+def _normalize_rows(matrix):
+    totals = matrix.sum(axis=1, keepdims=True)
+    return np.divide(matrix, totals, out=np.zeros_like(matrix), where=totals > 0)
+
+
+def class_conditional_importance(forest, min_importance=MIN_STORED_IMPORTANCE):
+    """Sparse (n_classes x n_features) importance matrix of a fitted forest classifier."""
+    estimators = getattr(forest, "estimators_", None)
+    if not estimators:
+        raise TypeError(f"{type(forest).__name__} is not a fitted tree ensemble")
+
+    n_classes = int(forest.n_classes_)
+    n_features = int(forest.n_features_in_)
+    importance = np.zeros((n_classes, n_features))
+    for estimator in estimators:
+        tree = estimator.tree_
+        value = tree.value[:, 0, :n_classes]
+        proba = _normalize_rows(np.asarray(value, dtype=np.float64))
+        # Weighted per-class Gini terms of every node
+        gini = tree.weighted_n_node_samples[:, np.newaxis] * proba * (1.0 - proba)
+
+        internal = np.flatnonzero(tree.children_left != -1)
+        decrease = gini[internal] - gini[tree.children_left[internal]] - gini[tree.children_right[internal]]
+        tree_importance = np.zeros((n_features, n_classes))
+        np.add.at(tree_importance, tree.feature[internal], decrease)
+
+        importance += _normalize_rows(np.clip(tree_importance.T, 0.0, None))
+
+    importance = _normalize_rows(importance / len(estimators))
+    importance[importance < min_importance] = 0.0
+    return sparse.csr_matrix(importance)
+
+
+def save_class_importance(path, matrix, classes, symptoms):
+    matrix = sparse.csr_matrix(matrix)
+    np.savez_compressed(
+        path,
+        data=matrix.data,
+        indices=matrix.indices,
+        indptr=matrix.indptr,
+        shape=np.array(matrix.shape),
+        classes=np.array([str(disease) for disease in classes]),
+        symptoms=np.array([str(symptom) for symptom in symptoms]),
+    )
+
+
+def load_class_importance(path, classes, symptoms):
+    """Load the CSR matrix, checking it is aligned with the model's classes and symptoms."""
+    with np.load(path) as saved:
+        if list(saved["classes"]) != [str(disease) for disease in classes]:
+            raise ValueError(f"{path} was built for different disease classes")
+        if list(saved["symptoms"]) != [str(symptom) for symptom in symptoms]:
+            raise ValueError(f"{path} was built for a different symptom list")
+        return sparse.csr_matrix(
+            (saved["data"], saved["indices"], saved["indptr"]), shape=tuple(saved["shape"])
+        )
+
+
+def class_importance_for_model(model, classes, symptoms, path):
+    """The importance saved at path by training, or derived from the trees if there is none."""
+    if os.path.exists(path):
+        try:
+            matrix = load_class_importance(path, classes, symptoms)
+            print(f"Loaded class-conditional importance ({matrix.nnz} entries) from {path}")
+            return matrix
+        except Exception as e:
+            print(f"Ignoring {path}: {e}")
+    print("Deriving class-conditional importance from the trees...")
+    return class_conditional_importance(model)
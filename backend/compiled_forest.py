@@ -0,0 +1,183 @@
+"""
+Flat-array evaluator for fitted sklearn tree ensembles.
+
+All trees' node arrays (feature, threshold, children) are concatenated into one
+contiguous set of arrays at load time, and every row walks every tree at once,
+one tree level per step; paths drop out once they reach a leaf. Leaf
+probabilities are computed and summed exactly as
+RandomForestClassifier.predict_proba does, so the results are bit-identical.
+"""
+import os
+
+import numpy as np
+import sklearn
+
+# Before scikit-learn 1.4 tree_.value held weighted class counts and
+# DecisionTreeClassifier.predict_proba normalized them per call; since 1.4 the
+# values are stored as fractions and returned as-is.
+_SKLEARN_VERSION = tuple(int(part) for part in sklearn.__version__.split(".")[:2])
+_NORMALIZES_PROBA = _SKLEARN_VERSION < (1, 4)
+
+# sklearn marks leaves with children == -1
+TREE_LEAF = -1
+
+
+def _leaf_probabilities(tree, n_classes):
+    """Per-node class probabilities, as DecisionTreeClassifier.predict_proba returns them."""
+    proba = tree.value[:, 0, :n_classes]
+    if _NORMALIZES_PROBA:
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        proba = proba / normalizer
+    return proba
+
+
+def _map_arrays(files, max_depth, n_features):
+    """A CompiledForest over memory-mapped .npy files; how mapped forests are unpickled."""
+    arrays = {name: np.load(path, mmap_mode="r") for name, path in files.items()}
+    forest = CompiledForest(**arrays, max_depth=max_depth, n_features=n_features)
+    forest.mapped_files = files
+    return forest
+
+
+class CompiledForest:
+    """A tree ensemble stored as contiguous arrays, evaluated level by level."""
+
+    def __init__(self, feature, threshold, left, right, leaf_index, leaf_values, roots, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_index = leaf_index
+        self.leaf_values = leaf_values
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.n_trees = len(roots)
+        self.n_classes = leaf_values.shape[1]
+        # name -> absolute .npy path when the arrays are memory-mapped from a model artifact
+        self.mapped_files = None
+
+    def __reduce_ex__(self, protocol):
+        # Pickling a memmap copies its data. A mapped forest is sent as its file
+        # paths instead, so worker processes map the same pages through the OS
+        # page cache. The files are named after their contents and never
+        # rewritten, so the receiver maps exactly these arrays.
+        if self.mapped_files and all(os.path.exists(path) for path in self.mapped_files.values()):
+            return _map_arrays, (self.mapped_files, self.max_depth, self.n_features)
+        return super().__reduce_ex__(protocol)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """Export the fitted trees of a RandomForest/ExtraTrees classifier."""
+        estimators = getattr(forest, "estimators_", None)
+        if not estimators:
+            raise TypeError(f"{type(forest).__name__} is not a fitted tree ensemble")
+        if getattr(forest, "n_outputs_", 1) != 1:
+            raise TypeError("Only single-output forests can be compiled")
+
+        n_classes = int(forest.n_classes_)
+        features, thresholds, lefts, rights, leaf_indexes, values, roots = [], [], [], [], [], [], []
+        node_offset = 0
+        leaf_offset = 0
+        max_depth = 0
+
+        for estimator in estimators:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count, dtype=np.intp)
+            is_leaf = tree.children_left == TREE_LEAF
+
+            # Leaves point at themselves, so extra traversal steps are no-ops
+            left = np.where(is_leaf, node_ids, tree.children_left) + node_offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + node_offset
+            feature = np.where(is_leaf, 0, tree.feature)
+
+            leaf_index = np.full(tree.node_count, -1, dtype=np.intp)
+            n_leaves = int(is_leaf.sum())
+            leaf_index[is_leaf] = np.arange(leaf_offset, leaf_offset + n_leaves)
+
+            features.append(feature)
+            thresholds.append(tree.threshold)
+            lefts.append(left)
+            rights.append(right)
+            leaf_indexes.append(leaf_index)
+            values.append(_leaf_probabilities(tree, n_classes)[is_leaf])
+            roots.append(node_offset)
+
+            node_offset += tree.node_count
+            leaf_offset += n_leaves
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            leaf_index=np.ascontiguousarray(np.concatenate(leaf_indexes), dtype=np.intp),
+            leaf_values=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            n_features=forest.n_features_in_,
+        )
+
+    def apply(self, X):
+        """Return the (n_rows, n_trees) leaf numbers reached by every row in every tree."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n_rows, {self.n_features}), got {X.shape}")
+
+        n_rows = X.shape[0]
+        flat_X = np.ascontiguousarray(X).ravel()
+        # One (row, tree) path per entry; row_offset locates the row in flat_X
+        node = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.intp) * self.n_features, self.n_trees)
+        # Paths still at an internal node; most reach a leaf long before max_depth
+        active = np.arange(node.size)
+        for _ in range(self.max_depth):
+            current = node[active]
+            # float32 inputs are compared against float64 thresholds, as in sklearn
+            go_left = flat_X[row_offset[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            node[active] = current
+            active = active[self.left[current] != current]
+            if not active.size:
+                break
+        return self.leaf_index[node].reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X):
+        return self.proba_from_leaves(self.apply(X))
+
+    def proba_from_leaves(self, leaves):
+        """Average leaf probabilities over trees, accumulated in estimator order."""
+        proba = np.zeros((leaves.shape[0], self.n_classes), dtype=np.float64)
+        for tree in range(self.n_trees):
+            proba += self.leaf_values[leaves[:, tree]]
+        proba /= self.n_trees
+        return proba
+
+
+class BatchSizeRouter:
+    """
+    A fast engine for small batches and the sklearn model for large ones.
+
+    Walking the flat arrays costs a few NumPy calls per tree level whatever
+    the batch size, so it wins for the single requests and micro-batches the
+    API sees most; sklearn's per-tree C loops win once a batch has a few
+    hundred rows. Both sum the trees in estimator order, so results are
+    identical whichever engine runs.
+    """
+
+    def __init__(self, small, large, min_large_rows):
+        self.small = small
+        self.large = large
+        self.min_large_rows = int(min_large_rows)
+        # Threaded predict_proba sums trees in completion order
+        self.large.n_jobs = 1
+
+    def predict_proba(self, X):
+        engine = self.large if len(X) >= self.min_large_rows else self.small
+        return engine.predict_proba(X)
+
+    @property
+    def name(self):
+        return f"{type(self.small).__name__}, {type(self.large).__name__} from {self.min_large_rows} rows"
@@ -0,0 +1,334 @@
+"""
+Build smaller candidate serving models from a trained forest and compare them.
+
+Candidates:
+  trees-K      the first K trees of the forest (trees are i.i.d., so a prefix
+               is an unbiased subset)
+  depth-D      every tree cut at depth D; cut nodes become leaves holding the
+               class distribution of their training samples
+  merged       sibling leaves that predict the same class are merged into
+               their parent, repeatedly, until no pair is left
+  distill-KxD  a new K-tree forest of depth D trained on the teacher's labels
+               for the training rows plus partial (1-5 symptom) copies of them
+
+Every candidate is a regular sklearn forest saved in the same bundle format as
+the original, so any of them can be dropped in as MODEL_PATH. For each one the
+report gives test accuracy and its delta against the original (same
+train/test split as training), top-1 agreement with the original, node count,
+file size, and p50/p99 single-row latency and RSS measured in a fresh process.
+
+Usage (from the backend directory):
+
+    python compress_model.py --data "../new model/data/Training.csv"
+"""
+import argparse
+import copy
+import json
+import os
+import subprocess
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.tree._tree import Tree, TREE_LEAF, TREE_UNDEFINED
+
+from compiled_forest import CompiledForest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "..", "new model", "app", "disease_model.pkl")
+DATA_PATH = os.path.join(BASE_DIR, "..", "new model", "data", "Training.csv")
+OUTPUT_DIR = os.path.join(BASE_DIR, "compressed_models")
+LABEL_COLUMNS = ("prognosis", "diseases")
+
+# Inputs are plain arrays in symptom column order, as at serving time
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+def load_bundle(path):
+    bundle = joblib.load(path)
+    if not isinstance(bundle, dict):
+        bundle = {"model": bundle, "encoder": None, "symptoms": None}
+    return bundle
+
+
+def load_split(data_path, bundle):
+    """The train/test split used by new model/model.py (test_size=0.2, random_state=42)."""
+    df = pd.read_csv(data_path)
+    label_column = next((c for c in LABEL_COLUMNS if c in df.columns), None)
+    if label_column is None:
+        raise ValueError(f"{data_path} has none of the label columns {LABEL_COLUMNS}")
+    feature_names = getattr(bundle["model"], "feature_names_in_", None)
+    if feature_names is not None:
+        symptoms = list(feature_names)
+    else:
+        symptoms = bundle["symptoms"] or list(df.columns.drop(label_column))
+    X = df[symptoms].to_numpy(dtype=np.float32)
+    labels = df[label_column]
+    y = bundle["encoder"].transform(labels) if bundle["encoder"] is not None else labels.to_numpy()
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
+
+# --- Pruning of fitted trees ------------------------------------------------
+
+def _rebuild_tree(tree, as_leaf):
+    """Copy of a fitted sklearn Tree where every node in as_leaf becomes a leaf."""
+    state = tree.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+
+    # Pre-order walk of the nodes that are still reachable
+    order, depths = [], []
+    stack = [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        order.append(node)
+        depths.append(depth)
+        if node not in as_leaf and nodes[node]["left_child"] != TREE_LEAF:
+            stack.append((nodes[node]["right_child"], depth + 1))
+            stack.append((nodes[node]["left_child"], depth + 1))
+
+    new_id = {old: new for new, old in enumerate(order)}
+    new_nodes = nodes[order].copy()
+    for new, old in enumerate(order):
+        if old in as_leaf or nodes[old]["left_child"] == TREE_LEAF:
+            new_nodes[new]["left_child"] = TREE_LEAF
+            new_nodes[new]["right_child"] = TREE_LEAF
+            new_nodes[new]["feature"] = TREE_UNDEFINED
+            new_nodes[new]["threshold"] = TREE_UNDEFINED
+        else:
+            new_nodes[new]["left_child"] = new_id[nodes[old]["left_child"]]
+            new_nodes[new]["right_child"] = new_id[nodes[old]["right_child"]]
+
+    pruned = Tree(tree.n_features, np.asarray(tree.n_classes, dtype=np.intp), tree.n_outputs)
+    pruned.__setstate__({
+        **state,
+        "max_depth": max(depths),
+        "node_count": len(order),
+        "nodes": new_nodes,
+        "values": np.ascontiguousarray(values[order]),
+    })
+    return pruned
+
+
+def _nodes_at_depth(tree, max_depth):
+    left, right = tree.children_left, tree.children_right
+    cut, stack = set(), [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if left[node] == TREE_LEAF:
+            continue
+        if depth >= max_depth:
+            cut.add(node)
+        else:
+            stack.extend([(left[node], depth + 1), (right[node], depth + 1)])
+    return cut
+
+
+def _mergeable_nodes(tree):
+    """Internal nodes whose whole subtree predicts a single class."""
+    left, right = tree.children_left, tree.children_right
+    predicted = tree.value[:, 0, :].argmax(axis=1)
+    merged = set()
+    # Children always have larger ids than their parent, so walk ids backwards
+    for node in range(tree.node_count - 1, -1, -1):
+        l, r = left[node], right[node]
+        if l == TREE_LEAF:
+            continue
+        l_leaf = left[l] == TREE_LEAF or l in merged
+        r_leaf = left[r] == TREE_LEAF or r in merged
+        if l_leaf and r_leaf and predicted[l] == predicted[r] == predicted[node]:
+            merged.add(node)
+    return merged
+
+
+def _prune_forest(forest, select_nodes):
+    pruned = copy.deepcopy(forest)
+    for estimator in pruned.estimators_:
+        estimator.tree_ = _rebuild_tree(estimator.tree_, select_nodes(estimator.tree_))
+    return pruned
+
+
+def subset_trees(forest, n_trees):
+    subset = copy.deepcopy(forest)
+    subset.estimators_ = subset.estimators_[:n_trees]
+    subset.n_estimators = len(subset.estimators_)
+    return subset
+
+
+def cap_depth(forest, max_depth):
+    return _prune_forest(forest, lambda tree: _nodes_at_depth(tree, max_depth))
+
+
+def merge_leaves(forest):
+    return _prune_forest(forest, _mergeable_nodes)
+
+
+def synthetic_queries(n_rows, n_features, seed=42):
+    """Binary rows with 1-5 random symptoms, shaped like real /api/predict inputs."""
+    rng = np.random.default_rng(seed)
+    X = np.zeros((n_rows, n_features), dtype=np.float32)
+    for row in range(n_rows):
+        k = rng.integers(1, 6)
+        X[row, rng.choice(n_features, size=min(k, n_features), replace=False)] = 1
+    return X
+
+
+def partial_queries(X_train, n_rows, seed=42):
+    """Training rows reduced to 1-5 of their own symptoms, like a partially filled symptom picker."""
+    rng = np.random.default_rng(seed)
+    X = np.zeros((n_rows, X_train.shape[1]), dtype=np.float32)
+    for row, source in enumerate(rng.integers(0, len(X_train), size=n_rows)):
+        present = np.flatnonzero(X_train[source])
+        if present.size:
+            k = min(rng.integers(1, 6), present.size)
+            X[row, rng.choice(present, size=k, replace=False)] = 1
+    return X
+
+
+def distill(teacher, X_train, n_trees, max_depth, n_synthetic=10000):
+    X_synthetic = partial_queries(X_train, n_synthetic)
+    X = np.vstack([X_train, X_synthetic])
+    y = teacher.predict(X)
+    student = RandomForestClassifier(n_estimators=n_trees, max_depth=max_depth, random_state=42, n_jobs=-1)
+    student.fit(X, y)
+    if not np.array_equal(student.classes_, teacher.classes_):
+        raise ValueError("teacher never predicts some classes on the distillation set")
+    if hasattr(teacher, "feature_names_in_"):
+        student.feature_names_in_ = teacher.feature_names_in_
+    return student
+
+
+# --- Measurement -------------------------------------------------------------
+
+def _rss_bytes():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def measure(model_path, engine="compiled", n_rows=2000):
+    """Load one model and time single-row predict_proba (run in a fresh process)."""
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    model = load_bundle(model_path)["model"]
+    if engine == "compiled":
+        model = CompiledForest.from_sklearn(model)
+    load_seconds = time.perf_counter() - start
+    rss_after = _rss_bytes()
+
+    X = synthetic_queries(n_rows, model.n_features_in_ if engine == "sklearn" else model.n_features, seed=7)
+    for row in range(min(100, n_rows)):
+        model.predict_proba(X[row:row + 1])
+    timings = np.empty(n_rows)
+    for row in range(n_rows):
+        start = time.perf_counter()
+        model.predict_proba(X[row:row + 1])
+        timings[row] = time.perf_counter() - start
+    return {
+        "load_seconds": load_seconds,
+        "rss_mb": (rss_after - rss_before) / 2 ** 20,
+        "p50_ms": float(np.percentile(timings, 50) * 1000),
+        "p99_ms": float(np.percentile(timings, 99) * 1000),
+    }
+
+
+def measure_in_subprocess(model_path, engine):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--measure", model_path, "--engine", engine],
+        capture_output=True, text=True, check=True, cwd=BASE_DIR,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def build_candidates(model, X_train, tree_counts, depths, merge, distill_specs):
+    candidates = {"original": model}
+    for n_trees in tree_counts:
+        if n_trees < len(model.estimators_):
+            candidates[f"trees-{n_trees}"] = subset_trees(model, n_trees)
+    for depth in depths:
+        candidates[f"depth-{depth}"] = cap_depth(model, depth)
+    if merge:
+        candidates["merged"] = merge_leaves(model)
+    for n_trees, depth in distill_specs:
+        name = f"distill-{n_trees}x{depth}"
+        try:
+            candidates[name] = distill(model, X_train, n_trees, depth)
+        except ValueError as e:
+            print(f"Skipping {name}: {e}")
+    return candidates
+
+
+def compress(model_path, data_path, output_dir, tree_counts, depths, merge, distill_specs, engine):
+    bundle = load_bundle(model_path)
+    model = bundle["model"]
+    X_train, X_test, y_train, y_test = load_split(data_path, bundle)
+    baseline_pred = model.predict(X_test)
+    baseline_acc = float(np.mean(baseline_pred == y_test))
+
+    os.makedirs(output_dir, exist_ok=True)
+    report = []
+    for name, candidate in build_candidates(model, X_train, tree_counts, depths, merge, distill_specs).items():
+        path = os.path.abspath(model_path) if name == "original" else os.path.join(output_dir, f"{name}.pkl")
+        if name != "original":
+            joblib.dump({**bundle, "model": candidate}, path)
+        pred = candidate.predict(X_test)
+        accuracy = float(np.mean(pred == y_test))
+        row = {
+            "name": name,
+            "path": path,
+            "trees": len(candidate.estimators_),
+            "nodes": int(sum(e.tree_.node_count for e in candidate.estimators_)),
+            "file_mb": os.path.getsize(path) / 2 ** 20,
+            "test_accuracy": accuracy,
+            "accuracy_delta": accuracy - baseline_acc,
+            "agreement": float(np.mean(pred == baseline_pred)),
+            **measure_in_subprocess(path, engine),
+        }
+        report.append(row)
+        print(
+            f"{name:<16} trees={row['trees']:>4} nodes={row['nodes']:>8} file={row['file_mb']:7.1f}MB "
+            f"acc={accuracy:.4f} ({row['accuracy_delta']:+.4f}) agree={row['agreement']:.4f} "
+            f"p50={row['p50_ms']:.3f}ms p99={row['p99_ms']:.3f}ms rss={row['rss_mb']:.1f}MB"
+        )
+
+    report_path = os.path.join(output_dir, "compression_report.json")
+    with open(report_path, "w") as f:
+        json.dump({"engine": engine, "baseline_accuracy": baseline_acc, "candidates": report}, f, indent=2)
+    print(f"\nReport written to {report_path}")
+    return report
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def _distill_specs(value):
+    # "30x12,50x16" -> [(30, 12), (50, 16)]
+    return [tuple(int(part) for part in spec.split("x")) for spec in value.split(",") if spec]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default=DATA_PATH, help="training CSV the model was fitted on")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--trees", type=_int_list, default=[10, 25, 50])
+    parser.add_argument("--depths", type=_int_list, default=[8, 12])
+    parser.add_argument("--no-merge", action="store_true")
+    parser.add_argument("--distill", type=_distill_specs, default=[(25, 12)], help='e.g. "25x12,50x16"')
+    parser.add_argument("--engine", choices=["compiled", "sklearn"], default="compiled",
+                        help="engine used for latency and RSS measurements")
+    parser.add_argument("--measure", metavar="MODEL", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.engine)))
+    else:
+        compress(args.model, args.data, args.output_dir, args.trees, args.depths,
+                 not args.no_merge, args.distill, args.engine)
@@ -0,0 +1,123 @@
+"""
+In-memory index behind /doctors/search/.
+
+Built from the symptoms, symptom_specialty and doctors tables in three
+queries, then answers searches without touching the database:
+
+- symptom names -> trigram postings, so a substring query only checks the
+  names that contain all of its trigrams
+- symptom -> specialties
+- specialty -> doctors, sorted by rating (highest first)
+
+Searches match the old SQL query, name ILIKE '%query%': case-insensitive
+substring matching, where '%' and '_' in the query are LIKE wildcards.
+"""
+import heapq
+import re
+
+import models
+import schemas
+
+NGRAM = 3
+
+
+def _ngrams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def _like_pattern(query):
+    """Regex for ILIKE '%query%', with '%' and '_' as wildcards."""
+    parts = []
+    for char in query:
+        if char == "%":
+            parts.append(".*")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+def _rank_key(doctor):
+    return (-doctor["rating"], doctor["id"])
+
+
+class DoctorSearchIndex:
+    """Immutable snapshot of symptoms, their specialties and the doctors for each."""
+
+    def __init__(self, symptoms, symptom_specialties, doctors):
+        # symptoms: (id, name); symptom_specialties: (symptom_id, specialty); doctors: dicts
+        self.symptom_ids = [symptom_id for symptom_id, _ in symptoms]
+        self.names = [name or "" for _, name in symptoms]
+        self._lowered = [name.lower() for name in self.names]
+
+        self._postings = {}
+        for position, name in enumerate(self._lowered):
+            for gram in _ngrams(name):
+                self._postings.setdefault(gram, []).append(position)
+
+        self.specialties = {}
+        for symptom_id, specialty in symptom_specialties:
+            specialties = self.specialties.setdefault(symptom_id, [])
+            if specialty not in specialties:
+                specialties.append(specialty)
+
+        self.doctors_by_specialty = {}
+        for doctor in doctors:
+            self.doctors_by_specialty.setdefault(doctor["specialization"], []).append(doctor)
+        for specialty_doctors in self.doctors_by_specialty.values():
+            specialty_doctors.sort(key=_rank_key)
+
+    @classmethod
+    def from_db(cls, db):
+        symptoms = db.query(models.Symptom.id, models.Symptom.name).order_by(models.Symptom.id).all()
+        symptom_specialties = db.query(
+            models.symptom_specialty.c.symptom_id, models.symptom_specialty.c.specialty
+        ).all()
+        doctors = [
+            schemas.DoctorResponse.model_validate(doctor).model_dump()
+            for doctor in db.query(models.Doctor).all()
+        ]
+        return cls(symptoms, symptom_specialties, doctors)
+
+    def stats(self):
+        return {
+            "symptoms": len(self.names),
+            "specialties": len(self.doctors_by_specialty),
+            "doctors": sum(len(doctors) for doctors in self.doctors_by_specialty.values()),
+            "ngrams": len(self._postings),
+        }
+
+    def _candidates(self, needle):
+        """Positions of names that may contain needle (a superset, checked by the caller)."""
+        grams = _ngrams(needle)
+        if not grams:
+            return range(len(self.names))
+        postings = [self._postings.get(gram) for gram in grams]
+        if not all(postings):
+            return []
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                break
+        return sorted(candidates)
+
+    def matching_symptoms(self, query):
+        """Positions of the symptoms whose name matches ILIKE '%query%'."""
+        if "%" in query or "_" in query:
+            pattern = _like_pattern(query)
+            # Only the literal runs between wildcards can be looked up by trigram
+            literal = max(re.split(r"[%_]", query.lower()), key=len)
+            return [p for p in self._candidates(literal) if pattern.search(self.names[p])]
+        needle = query.lower()
+        return [p for p in self._candidates(needle) if needle in self._lowered[p]]
+
+    def search(self, query):
+        """Doctors for any specialty of a symptom matching query, best rated first."""
+        specialties = set()
+        for position in self.matching_symptoms(query):
+            specialties.update(self.specialties.get(self.symptom_ids[position], ()))
+        lists = [self.doctors_by_specialty[s] for s in specialties if s in self.doctors_by_specialty]
+        return list(heapq.merge(*lists, key=_rank_key))
@@ -0,0 +1,79 @@
+"""
+Export a joblib model bundle as a memory-mappable artifact directory.
+
+Run from the backend directory after training or compressing a model:
+
+    python export_model_artifact.py [model.pkl] [output_dir]
+
+The server loads the artifact instead of the pickle when MODEL_ARTIFACT_PATH
+(default: 'new model/app/disease_model') contains one. The model version is
+the hash of the source pickle, so caches and precomputed prediction tables
+stay valid across the two formats. The class-conditional importance saved by
+training next to the pickle (class_importance.npz) is exported with it.
+"""
+import json
+import os
+import sys
+import warnings
+
+import joblib
+import numpy as np
+
+from class_importance import CLASS_IMPORTANCE_FILE, class_importance_for_model
+from model_artifact import export_artifact, file_digest, load_artifact
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "..", "new model", "app", "disease_model.pkl")
+ARTIFACT_PATH = os.path.join(BASE_DIR, "..", "new model", "app", "disease_model")
+ENCODER_PATH = os.path.join(BASE_DIR, "..", "new model", "app", "label_encoder.pkl")
+SYMPTOMS_PATH = os.path.join(BASE_DIR, "..", "new model", "app", "symptoms.json")
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+def load_bundle(model_path):
+    """(model, classes, symptoms) from a bundle dict or a bare pickled model."""
+    bundle = joblib.load(model_path)
+    if not isinstance(bundle, dict):
+        bundle = {"model": bundle}
+    model = bundle["model"]
+
+    encoder = bundle.get("encoder") or joblib.load(ENCODER_PATH)
+    feature_names = getattr(model, "feature_names_in_", None)
+    if feature_names is not None:
+        symptoms = list(feature_names)
+    elif bundle.get("symptoms"):
+        symptoms = bundle["symptoms"]
+    else:
+        with open(SYMPTOMS_PATH) as f:
+            symptoms = json.load(f)["symptoms"]
+    return model, encoder.classes_, symptoms
+
+
+def export(model_path=MODEL_PATH, artifact_path=ARTIFACT_PATH):
+    model, classes, symptoms = load_bundle(model_path)
+    importance = class_importance_for_model(
+        model, classes, symptoms, os.path.join(os.path.dirname(model_path), CLASS_IMPORTANCE_FILE)
+    )
+    manifest = export_artifact(
+        artifact_path, model, classes, symptoms, importance,
+        model_version=file_digest(model_path), source=os.path.basename(model_path),
+    )
+
+    # The exported forest must give exactly the pickle's probabilities
+    model.n_jobs = 1
+    rng = np.random.default_rng(0)
+    X = (rng.random((500, len(symptoms))) < 0.03).astype(np.float32)
+    X[np.arange(len(X)), rng.integers(0, len(symptoms), len(X))] = 1
+    if not np.array_equal(load_artifact(artifact_path).forest.predict_proba(X), model.predict_proba(X)):
+        print("❌ Exported forest does not match the pickled model")
+        return False
+
+    size = sum(os.path.getsize(os.path.join(artifact_path, spec["file"])) for spec in manifest["arrays"].values())
+    print(f"✅ Exported {manifest['n_trees']} trees (version {manifest['model_version']}, "
+          f"{size / 2 ** 20:.1f} MB) to {artifact_path}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if export(*sys.argv[1:3]) else 1)
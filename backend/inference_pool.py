@@ -0,0 +1,164 @@
+"""
+Process pool for CPU-bound model work, so predictions never run on the event loop.
+
+Workers are started from a forkserver, a single-threaded process with the
+model code already imported, because forking the API server itself (which
+runs executor, database and pool threads) can deadlock the child. Each
+worker receives the batch function, and with it the model's scoring state,
+once when it starts; after that only the batch inputs and results cross the
+process boundary.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+START_METHOD = "forkserver"
+# Imported once in the forkserver, so new workers start without re-importing them
+PRELOAD_MODULES = ["inference_pool", "predictor"]
+
+# Set in each worker by its initializer
+_batch_fn = None
+
+
+def mp_context():
+    """The multiprocessing context worker pools are started from, or None if unavailable."""
+    if START_METHOD not in multiprocessing.get_all_start_methods():
+        return None
+    context = multiprocessing.get_context(START_METHOD)
+    context.set_forkserver_preload(PRELOAD_MODULES)
+    return context
+
+
+def _init_worker(batch_fn):
+    global _batch_fn
+    _batch_fn = batch_fn
+
+
+def _run_batch(items):
+    return _batch_fn(items)
+
+
+def _ping():
+    return True
+
+
+class InferencePoolBusy(Exception):
+    """Raised when the pool queue is full and the caller did not ask to wait."""
+
+
+class InferencePool:
+    """Runs batch_fn(items) in forked worker processes, with a bounded queue."""
+
+    def __init__(self, batch_fn, workers=2, max_queue=64):
+        self.batch_fn = batch_fn
+        self.workers = max(0, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self._executor = None
+        self._closed = False
+        self._capacity = asyncio.Semaphore(self.workers + self.max_queue) if self.workers else None
+        self._restarting = asyncio.Lock()
+        # Calls inside run(): waiting for capacity or a restart, or running in a worker
+        self.pending = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+        if self.workers and mp_context() is None:
+            print(f"Process pool needs the '{START_METHOD}' start method; running inference inline instead")
+            self.workers = 0
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def start(self):
+        """
+        Start the workers now instead of on first use.
+
+        Blocks until every worker answers, so call it off the event loop.
+        """
+        if not self.enabled or self._closed or self._executor is not None:
+            return
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp_context(),
+            initializer=_init_worker,
+            initargs=(self.batch_fn,),
+        )
+        try:
+            for future in [executor.submit(_ping) for _ in range(self.workers)]:
+                future.result()
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        if self._closed:
+            # Closed while the workers were starting
+            executor.shutdown(wait=False, cancel_futures=True)
+            return
+        self._executor = executor
+        print(f"Started inference pool with {self.workers} worker processes")
+
+    def close(self):
+        """Stop the workers for good; later calls run batch_fn in a thread instead of restarting them."""
+        self._closed = True
+        self.shutdown()
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+
+    async def run(self, items, wait=False):
+        """
+        Run batch_fn(items) in a worker and return its result.
+
+        Without workers (disabled, or closed after a model swap) batch_fn runs
+        in the default thread pool, never on the event loop. With wait=False a
+        full queue raises InferencePoolBusy instead of queueing.
+        """
+        loop = asyncio.get_running_loop()
+        if not self.enabled or self._closed:
+            return await loop.run_in_executor(None, self.batch_fn, items)
+
+        if not wait and self._capacity.locked():
+            self.rejected += 1
+            raise InferencePoolBusy("Inference queue is full, please retry shortly")
+
+        self.pending += 1
+        try:
+            async with self._capacity:
+                if self._executor is None:
+                    # (Re)start the workers in a thread; concurrent callers wait for one restart
+                    async with self._restarting:
+                        if self._executor is None:
+                            await loop.run_in_executor(None, self.start)
+                executor = self._executor
+                if executor is None:
+                    # The pool was closed meanwhile
+                    return await loop.run_in_executor(None, self.batch_fn, items)
+                self.in_flight += 1
+                try:
+                    return await loop.run_in_executor(executor, _run_batch, items)
+                except BrokenProcessPool:
+                    # A worker died (e.g. OOM killed); replace the pool for the next call
+                    if self._executor is executor:
+                        print("Inference worker died, restarting the process pool")
+                        self.shutdown(wait=False)
+                    raise
+                finally:
+                    self.in_flight -= 1
+                    self.completed += 1
+        finally:
+            self.pending -= 1
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
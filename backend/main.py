@@ -1,27 +1,35 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Query
+from fastapi import FastAPI, HTTPException, Depends, status, Query, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
-import joblib
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import func, or_, select
+import asyncio
 import json
 import os
-from database import SessionLocal, engine
+import time
+import sqlite3
+from database import AsyncSessionLocal, SessionLocal, engine
 import models
 from schemas import DoctorResponse, SymptomResponse, SymptomCreate
 import schemas
 from disease_specialties import get_relevant_specialties
+from batch_input import parse_symptom_file
+from inference_pool import InferencePoolBusy
+from cache import SharedClearCache, SQLiteCache, TieredCache, TTLCache
+from doctor_search import DoctorSearchIndex
+from class_importance import CLASS_IMPORTANCE_FILE
+from model_artifact import is_artifact
+from predictor import SKLEARN_MIN_ROWS, Predictor
+from shadow import ShadowRunner
 import numpy as np
-import pandas as pd
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 # Import the disease explanation router
 from disease_explanation import router as explanation_router
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
-
 app = FastAPI()
 
 # Include the explanation router
@@ -39,124 +47,391 @@ app.add_middleware(
 # Define paths relative to the current file
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "..", "new model", "app", "disease_model.pkl")
+# Memory-mapped export of MODEL_PATH (export_model_artifact.py); used instead of the pickle when present
+MODEL_ARTIFACT_PATH = os.getenv("MODEL_ARTIFACT_PATH", os.path.join(BASE_DIR, "..", "new model", "app", "disease_model"))
 METRICS_PATH = os.path.join(BASE_DIR, "..", "new model", "app", "model_metrics.pkl")
 SYMPTOMS_PATH = os.path.join(BASE_DIR, "models", "symptoms.json")
 
-# Global variables to store model data
-model = None
-label_encoder = None
-model_symptoms = None
-feature_vector_template = None
+# "compiled" evaluates the forest from flat arrays, "bitvector" uses per-symptom
+# leaf bitmasks on top of them, "sklearn" uses model.predict_proba
+PREDICT_ENGINE = os.getenv("PREDICT_ENGINE", "compiled")
+# Larger batches (e.g. /api/predict/batch) use the sklearn model, which is faster
+# for them; see predictor.SKLEARN_MIN_ROWS. 0 keeps every batch on PREDICT_ENGINE.
+PREDICT_SKLEARN_MIN_ROWS = int(os.getenv("PREDICT_SKLEARN_MIN_ROWS", str(SKLEARN_MIN_ROWS)))
+
+# Micro-batching of concurrent predictions (a window of 0 or a batch of 1 disables it)
+PREDICT_BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "2"))
+PREDICT_MAX_BATCH = int(os.getenv("PREDICT_MAX_BATCH", "32"))
+
+# Worker processes for model work (0 runs it inline) and how many batches may wait for them
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+
+# Rows scored per chunk by /api/predict/batch, and the largest request it accepts
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "256"))
+BULK_MAX_BODY_BYTES = int(os.getenv("BULK_MAX_BODY_BYTES", str(10 * 1024 * 1024)))
+BULK_MAX_SYMPTOM_SETS = int(os.getenv("BULK_MAX_SYMPTOM_SETS", "100000"))
+
+# Warm-up before /readyz reports ready: this many random 1-5 symptom predictions,
+# plus every symptom set in PREDICT_WARMUP_FILE (CSV or JSONL, as for /api/predict/batch)
+PREDICT_WARMUP_COUNT = int(os.getenv("PREDICT_WARMUP_COUNT", "64"))
+PREDICT_WARMUP_FILE = os.getenv("PREDICT_WARMUP_FILE")
+
+# Poll the model files every MODEL_WATCH_INTERVAL seconds and hot-swap a new version
+# (0 disables; POST /api/admin/model/reload always works). A replaced model's workers
+# are kept up to MODEL_RETIRE_GRACE_SECONDS for requests that started on it.
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "30"))
+MODEL_RETIRE_GRACE_SECONDS = float(os.getenv("MODEL_RETIRE_GRACE_SECONDS", "60"))
+
+# Admin list endpoints return keyset-paginated pages of ADMIN_PAGE_SIZE rows by
+# default and at most ADMIN_MAX_PAGE_SIZE; exports (stream=true) read EXPORT_BATCH_SIZE at a time
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "50"))
+ADMIN_MAX_PAGE_SIZE = int(os.getenv("ADMIN_MAX_PAGE_SIZE", "200"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+# Shadow mode: a candidate model (pickle or artifact directory) scores this fraction
+# of /api/predict inputs after the response is sent, within a CPU budget given as
+# a fraction of one core
+SHADOW_MODEL_PATH = os.getenv("SHADOW_MODEL_PATH")
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.05"))
+SHADOW_CPU_BUDGET = float(os.getenv("SHADOW_CPU_BUDGET", "0.1"))
 
-# Cache for disease predictions and feature importances
-disease_features_cache = {}
-prediction_cache = {}
+# The model requests are served with; None until the background load finishes
+serving_model = None
+model_reload_lock = asyncio.Lock()
+shadow_runner = None
+startup_status = {"database": "pending", "model": "loading", "warmup": "pending", "error": None}
+
+# Two cache layers: model results keyed on (model version, valid symptom columns),
+# and doctor lists keyed on the specialty set, cleared by the doctor admin endpoints
 CACHE_TIMEOUT = 300  # 5 minutes
+CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# "sqlite" shares model results between uvicorn workers and across restarts;
+# "memory" keeps them per process. PREDICTION_CACHE_L1=0 disables the in-memory layer.
+CACHE_BACKEND = os.getenv("PREDICTION_CACHE_BACKEND", "sqlite").lower()
+CACHE_PATH = os.getenv("PREDICTION_CACHE_PATH", os.path.join(BASE_DIR, "cache", "predictions.sqlite3"))
+CACHE_L1 = os.getenv("PREDICTION_CACHE_L1", "1") != "0"
+# With the sqlite backend, a doctor edit in one worker clears the doctor lists
+# of every worker within DOCTOR_CACHE_CHECK_INTERVAL seconds
+DOCTOR_CACHE_CHECK_INTERVAL = float(os.getenv("DOCTOR_CACHE_CHECK_INTERVAL", "1"))
 
-# Load the model and encoders with lower memory usage
-try:
-    print("Loading model files...")
-    
-    # Load model bundle with optimized memory mapping
-    print("Loading disease prediction model (this may take a moment)...")
-    model_bundle = joblib.load(MODEL_PATH)
-    print("Model loaded successfully!")
-    
-    # Extract components from the bundle
-    if isinstance(model_bundle, dict):
-        # Extract model, encoder and symptoms from the bundle
-        model = model_bundle.get("model")
-        label_encoder = model_bundle.get("encoder")  # Changed from "label_encoder" to "encoder"
-        bundle_symptoms = model_bundle.get("symptoms")
-        
-        if bundle_symptoms:
-            SYMPTOMS = bundle_symptoms
-            print(f"Loaded {len(SYMPTOMS)} symptoms from model bundle")
-        else:
-            # Fall back to symptoms.json if bundle doesn't have symptoms
-            with open(SYMPTOMS_PATH, 'r') as f:
-                symptoms_data = json.load(f)
-                SYMPTOMS = symptoms_data['symptoms']
-            print(f"Loaded {len(SYMPTOMS)} symptoms from symptoms.json")
+
+def create_prediction_cache():
+    memory_cache = TTLCache(max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, ttl_seconds=CACHE_TIMEOUT)
+    if CACHE_BACKEND != "sqlite":
+        return memory_cache
+    try:
+        # Entries are keyed on the model version, so they never go stale
+        shared_cache = SQLiteCache(CACHE_PATH, max_entries=int(os.getenv("PREDICTION_CACHE_SHARED_MAX_ENTRIES", "200000")))
+    except sqlite3.Error as e:
+        print(f"Could not open shared prediction cache at {CACHE_PATH}: {e}; using in-memory cache")
+        return memory_cache
+    print(f"Using shared prediction cache at {CACHE_PATH}")
+    return TieredCache(memory_cache, shared_cache) if CACHE_L1 else shared_cache
+
+
+def create_doctor_cache():
+    memory_cache = TTLCache(max_entries=1024, max_bytes=8 * 1024 * 1024, ttl_seconds=CACHE_TIMEOUT)
+    if CACHE_BACKEND != "sqlite":
+        return SharedClearCache(memory_cache)
+    path = os.path.join(os.path.dirname(CACHE_PATH), "generations.sqlite3")
+    try:
+        # Only the clear() generation is shared; doctor lists stay in each process
+        generations = SQLiteCache(path, max_entries=1000)
+    except sqlite3.Error as e:
+        print(f"Could not open {path}: {e}; doctor edits only clear this worker's doctor cache")
+        return SharedClearCache(memory_cache)
+    return SharedClearCache(memory_cache, generations, name="doctors", check_interval=DOCTOR_CACHE_CHECK_INTERVAL)
+
+
+# Created by the startup hook, so importing main never opens (or creates) the cache files
+prediction_cache = None
+doctor_cache = None
+
+# /doctors/search/ is answered from an in-memory index of symptoms, specialties
+# and doctors. It is rebuilt after doctor edits through the API, and every
+# SEARCH_INDEX_REFRESH_INTERVAL seconds to pick up seed scripts (seed_symptoms.py,
+# seed_doctors.py) and edits made by other worker processes (0 disables)
+SEARCH_INDEX_REFRESH_INTERVAL = float(os.getenv("SEARCH_INDEX_REFRESH_INTERVAL", "60"))
+doctor_search_index = None
+
+def refresh_search_index(db=None):
+    """Rebuild the doctor search index from the database and start serving it."""
+    global doctor_search_index
+    session = db if db is not None else SessionLocal()
+    try:
+        doctor_search_index = DoctorSearchIndex.from_db(session)
+    finally:
+        if db is None:
+            session.close()
+    return doctor_search_index
+
+async def refresh_search_index_async(db):
+    """refresh_search_index for an AsyncSession, after doctor edits through the API."""
+    global doctor_search_index
+    doctor_search_index = await db.run_sync(DoctorSearchIndex.from_db)
+    return doctor_search_index
+
+# Precomputed results for every 1- and 2-symptom input (build_prediction_table.py)
+PREDICTION_TABLE_DIR = os.getenv("PREDICTION_TABLE_DIR", os.path.join(BASE_DIR, "prediction_tables"))
+
+def load_model(model_path=None, artifact_path=None):
+    """Load the model and encoders with lower memory usage and build everything scoring needs."""
+    model_path = model_path or MODEL_PATH
+    artifact_path = artifact_path or MODEL_ARTIFACT_PATH
+    try:
+        return Predictor.load(
+            model_path,
+            artifact_path=artifact_path,
+            symptoms_path=SYMPTOMS_PATH,
+            engine=PREDICT_ENGINE,
+            sklearn_min_rows=PREDICT_SKLEARN_MIN_ROWS,
+            table_dir=PREDICTION_TABLE_DIR,
+            cache=prediction_cache,
+        )
+    except Exception as e:
+        print(f"Error loading model and encoders: {str(e)}")
+        print(f"Current directory: {os.getcwd()}")
+        print(f"Looking for files in: {BASE_DIR}")
+        print(f"Model path: {model_path}")
+        print(f"Model artifact path: {artifact_path}")
+        print(f"Symptoms path: {SYMPTOMS_PATH}")
+        raise
+
+@app.get("/healthz")
+async def healthz():
+    """The process is up and serving HTTP (the model may still be loading)."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Ready once the model is loaded and the warm-up predictions have run."""
+    ready = serving_model is not None and startup_status["warmup"] == "done"
+    body = {
+        "ready": ready,
+        **startup_status,
+        "model_version": serving_model.version if serving_model is not None else None,
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+def _current_model():
+    if serving_model is None:
+        raise HTTPException(
+            status_code=503,
+            detail="The prediction model is still loading, please retry shortly"
+        )
+    return serving_model
+
+def _warmup_items(model):
+    rng = np.random.default_rng(0)
+    n_symptoms = len(model.symptom_index)
+    column_sets = [
+        rng.choice(n_symptoms, size=min(int(rng.integers(1, 6)), n_symptoms), replace=False).tolist()
+        for _ in range(PREDICT_WARMUP_COUNT)
+    ]
+    if PREDICT_WARMUP_FILE:
+        with open(PREDICT_WARMUP_FILE, "rb") as f:
+            for entry in parse_symptom_file(f.read(), PREDICT_WARMUP_FILE):
+                columns, _, _ = model.symptom_index.resolve(entry["symptoms"])
+                if columns:
+                    column_sets.append(columns)
+    return [model.scoring_item(columns) for columns in column_sets]
+
+async def _warm_up(model):
+    """Run synthetic predictions through the batcher and workers, priming the prediction cache."""
+    items = _warmup_items(model)
+    results = await asyncio.gather(*[model.batcher.submit(item) for item in items])
+    for item, top_predictions in zip(items, results):
+        model.store_predictions(item, top_predictions)
+    return len(items)
+
+def _model_files_signature():
+    """(path, mtime, size) of the files that change when a new model is deployed."""
+    if is_artifact(MODEL_ARTIFACT_PATH):
+        paths = [os.path.join(MODEL_ARTIFACT_PATH, "manifest.json")]
     else:
-        model = model_bundle
-        label_encoder = None
-        
-        # Load symptoms from file
-        with open(SYMPTOMS_PATH, 'r') as f:
-            symptoms_data = json.load(f)
-            SYMPTOMS = symptoms_data['symptoms']
-        print(f"Loaded {len(SYMPTOMS)} symptoms from symptoms.json")
-
-    # If label_encoder is None, load it from create_label_encoder.py output
-    if label_encoder is None:
-        print("Model bundle missing encoder, loading from separate file...")
-        encoder_path = os.path.join(BASE_DIR, "..", "new model", "app", "label_encoder.pkl")
+        paths = [MODEL_PATH, os.path.join(os.path.dirname(MODEL_PATH), CLASS_IMPORTANCE_FILE)]
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            if path == paths[0]:
+                return None
+            continue
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+async def reload_model():
+    """
+    Load the model files and, if they hold a new version, swap it in.
+
+    The new model gets its own workers and is warmed up before the swap.
+    Requests that already took the old model finish on it; its workers are
+    stopped once they are idle, and its prediction cache entries are dropped.
+    """
+    global serving_model
+    async with model_reload_lock:
+        loop = asyncio.get_running_loop()
+        signature = _model_files_signature()
+        model = await loop.run_in_executor(None, load_model)
+        previous = serving_model
+        app.state.model_signature = signature
+        if previous is not None and model.version == previous.version:
+            return {"reloaded": False, "version": model.version}
+        if previous is None:
+            startup_status["model"] = "loaded"
+
+        try:
+            # Starting the workers blocks until they answer, so it runs in a thread
+            await loop.run_in_executor(
+                None, model.start, INFERENCE_WORKERS, INFERENCE_MAX_QUEUE, PREDICT_MAX_BATCH, PREDICT_BATCH_WINDOW_MS
+            )
+            warmed = await _warm_up(model)
+        except BaseException:
+            # The new model never served; don't leave its workers behind
+            await loop.run_in_executor(None, model.close)
+            raise
+        serving_model = model
+        startup_status["warmup"] = "done"
+        startup_status["error"] = None
+        if shadow_runner is not None:
+            shadow_runner.start(model)
+
+        if previous is not None:
+            prediction_cache.delete_prefix((previous.version,))
+            asyncio.create_task(_retire(previous))
+        print(f"Serving model {model.version} ({warmed} warm-up predictions)")
+        return {
+            "reloaded": True,
+            "previous_version": previous.version if previous is not None else None,
+            "version": model.version,
+        }
+
+async def _retire(model):
+    """Let requests that started on a replaced model finish, then stop its workers."""
+    deadline = time.monotonic() + MODEL_RETIRE_GRACE_SECONDS
+    while True:
+        await asyncio.sleep(0.5)
+        # Queued items go to the old workers now rather than after the batch window
+        model.batcher.flush()
+        if not (model.batcher.pending or model.pool.pending) or time.monotonic() >= deadline:
+            break
+    await asyncio.get_running_loop().run_in_executor(None, model.close)
+    print(f"Stopped workers of replaced model {model.version}")
+
+async def _watch_model_files():
+    pending = None
+    while True:
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+        signature = _model_files_signature()
+        if signature is None or signature == app.state.model_signature:
+            pending = None
+            continue
+        # Only reload once the file has stopped changing (a copy may be in progress)
+        if signature != pending:
+            pending = signature
+            continue
+        pending = None
         try:
-            label_encoder = joblib.load(encoder_path)
-            print(f"Successfully loaded label encoder with {len(label_encoder.classes_)} classes")
+            await reload_model()
         except Exception as e:
-            print(f"Error loading label encoder: {e}")
-            # Create a simple label encoder
-            from sklearn.preprocessing import LabelEncoder
-            label_encoder = LabelEncoder()
-            if hasattr(model, "classes_"):
-                label_encoder.classes_ = model.classes_
-                print(f"Created label encoder from model classes: {len(label_encoder.classes_)} classes")
+            # Don't retry the same broken file; the next change triggers a new attempt
+            app.state.model_signature = signature
+            if serving_model is not None:
+                print(f"Model reload failed, still serving {serving_model.version}: {e}")
             else:
-                # Fallback to common disease names
-                print("Using fallback disease classes")
-                # Try to read from diseases_list.json
-                try:
-                    diseases_path = os.path.join(BASE_DIR, "..", "diseases_list.json")
-                    with open(diseases_path, 'r') as f:
-                        diseases_data = json.load(f)
-                        diseases = [d["disease"] for d in diseases_data[:50]]  # Limit to first 50
-                        label_encoder.classes_ = np.array(diseases)
-                        print(f"Created label encoder with {len(diseases)} diseases from diseases_list.json")
-                except Exception as e:
-                    print(f"Error loading diseases: {e}")
-                    # Hardcoded fallback
-                    label_encoder.classes_ = np.array([
-                        "Common Cold", "Pneumonia", "Diabetes", "Hypertension", 
-                        "Arthritis", "Migraine", "Asthma", "Influenza",
-                        "Hepatitis", "Dengue", "Tuberculosis", "Malaria",
-                        "Typhoid", "Jaundice", "Chicken pox", "Measles"
-                    ])
-                    print(f"Created fallback label encoder with {len(label_encoder.classes_)} classes")
-    
-    # Pre-compute model features and template
-    model_symptoms = SYMPTOMS if model.feature_names_in_ is None else model.feature_names_in_
-    feature_vector_template = pd.DataFrame(np.zeros((1, len(model_symptoms))), columns=model_symptoms)
-    
-    # Pre-compute disease features for all diseases
-    print("Pre-computing disease features...")
-    for idx, disease in enumerate(label_encoder.classes_):
-        # Convert disease to string if needed
-        disease_str = str(disease) if not isinstance(disease, str) else disease
-        
-        # Get feature importances for this disease
-        if hasattr(model, "feature_importances_"):
-            # For single model with feature_importances_ attribute
-            disease_features = model.feature_importances_
-        elif hasattr(model, "estimators_") and len(model.estimators_) > idx:
-            # For ensemble models with estimators
-            disease_features = model.estimators_[idx].feature_importances_
+                print(f"Model reload failed, no model is serving yet: {e}")
+
+async def _refresh_search_index_periodically():
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(SEARCH_INDEX_REFRESH_INTERVAL)
+        try:
+            await loop.run_in_executor(None, refresh_search_index)
+        except Exception as e:
+            print(f"Doctor search index refresh failed, keeping the previous one: {e}")
+
+async def _load_in_background():
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, models.Base.metadata.create_all, engine)
+        startup_status["database"] = "ready"
+    except Exception as e:
+        # Prediction does not need the database; report it and keep loading the model
+        startup_status["database"] = "error"
+        print(f"Error creating database tables: {e}")
+
+    try:
+        index = await loop.run_in_executor(None, refresh_search_index)
+        print(f"Doctor search index ready: {index.stats()}")
+    except Exception as e:
+        # /doctors/search/ builds it on first use instead
+        print(f"Could not build the doctor search index: {e}")
+    if SEARCH_INDEX_REFRESH_INTERVAL > 0:
+        app.state.search_index_refresher = asyncio.create_task(_refresh_search_index_periodically())
+
+    signature = _model_files_signature()
+    try:
+        start = time.perf_counter()
+        await reload_model()
+        print(f"Model ready after {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        startup_status["error"] = str(e)
+        if startup_status["model"] == "loaded":
+            startup_status["warmup"] = "error"
         else:
-            # Fallback to equal importance
-            disease_features = np.ones(len(model_symptoms)) / len(model_symptoms)
-        
-        disease_features_cache[disease_str] = disease_features
-    
-    print(f"Initialized prediction system with {len(model_symptoms)} features")
-    
-except Exception as e:
-    print(f"Error loading model and encoders: {str(e)}")
-    print(f"Current directory: {os.getcwd()}")
-    print(f"Looking for files in: {BASE_DIR}")
-    print(f"Model path: {MODEL_PATH}")
-    print(f"Symptoms path: {SYMPTOMS_PATH}")
-    raise
+            startup_status["model"] = "error"
+        print(f"Model startup failed: {e}")
+        # The watcher retries once these files change, not the same broken ones
+        app.state.model_signature = signature
+
+    # Watch even after a failed start, so deploying a working model recovers
+    if MODEL_WATCH_INTERVAL > 0:
+        app.state.model_watcher = asyncio.create_task(_watch_model_files())
+    if SHADOW_MODEL_PATH:
+        await _start_shadow()
+
+async def _start_shadow():
+    global shadow_runner
+    try:
+        # A directory is read as a model artifact, a file as a joblib pickle
+        candidate = await asyncio.get_running_loop().run_in_executor(
+            None, load_model, SHADOW_MODEL_PATH, SHADOW_MODEL_PATH
+        )
+        shadow_runner = ShadowRunner(candidate, sample_rate=SHADOW_SAMPLE_RATE, cpu_budget=SHADOW_CPU_BUDGET)
+        # Without a serving model yet, reload_model starts it with the first one
+        if serving_model is not None:
+            shadow_runner.start(serving_model)
+    except Exception as e:
+        print(f"Shadow model could not be loaded, shadow mode disabled: {e}")
+
+def _shadow_predict(background_tasks, valid_symptoms):
+    """Score a sampled input with the shadow model once the response has been sent."""
+    if shadow_runner is not None and shadow_runner.sample():
+        background_tasks.add_task(shadow_runner.submit, valid_symptoms)
+
+@app.on_event("startup")
+async def start_model_loading():
+    global prediction_cache, doctor_cache
+    loop = asyncio.get_running_loop()
+    prediction_cache = await loop.run_in_executor(None, create_prediction_cache)
+    doctor_cache = await loop.run_in_executor(None, create_doctor_cache)
+    # Runs in the background so uvicorn binds (and /healthz answers) immediately
+    app.state.model_loader = asyncio.create_task(_load_in_background())
+
+@app.on_event("shutdown")
+async def stop_inference_pool():
+    if serving_model is not None:
+        serving_model.close()
+    if shadow_runner is not None:
+        shadow_runner.shutdown()
+    # Write out predictions still queued for the shared cache
+    if prediction_cache is not None:
+        prediction_cache.flush(timeout=5)
+    if doctor_cache is not None:
+        doctor_cache.flush(timeout=5)
 
 # Dependency to get database session
 def get_db():
@@ -166,19 +441,25 @@ def get_db():
     finally:
         db.close()
 
+# Async session for the async endpoints: their queries are awaited, so database
+# waits of concurrent requests overlap instead of blocking the event loop
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Disease Prediction API"}
 
 @app.post("/register", response_model=schemas.UserResponse)
-async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user already exists
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+    db_user = await db.scalar(select(models.User).where(models.User.username == user.username).limit(1))
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
     # Check if email already exists
-    db_email = db.query(models.User).filter(models.User.email == user.email).first()
+    db_email = await db.scalar(select(models.User).where(models.User.email == user.email).limit(1))
     if db_email:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -191,20 +472,20 @@ async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db))
         password=user.password  # Store password as-is
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @app.post("/login", response_model=schemas.LoginResponse)
-async def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
     try:
         # Log the login attempt (without password)
         print(f"Login attempt for username: {user_credentials.username}, admin login: {user_credentials.is_admin_login}")
         
         # Find the user
-        user = db.query(models.User).filter(
-            models.User.username == user_credentials.username
-        ).first()
+        user = await db.scalar(
+            select(models.User).where(models.User.username == user_credentials.username).limit(1)
+        )
         
         if not user:
             raise HTTPException(
@@ -250,10 +531,15 @@ async def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_d
 
 @app.get("/api/symptoms")
 async def get_symptoms():
-    return {"symptoms": SYMPTOMS}
+    model = _current_model()
+    return {
+        "symptoms": model.symptoms,
+        "symptom_ids": model.symptom_index.to_list(),
+        "version": model.symptom_index.version
+    }
 
 @app.post("/api/predict", response_model=schemas.PredictionResponse)
-async def predict_disease(symptoms: schemas.SymptomsInput, db: Session = Depends(get_db)):
+async def predict_disease(symptoms: schemas.SymptomsInput, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
     try:
         if not symptoms.symptoms:
             raise HTTPException(
@@ -261,244 +547,64 @@ async def predict_disease(symptoms: schemas.SymptomsInput, db: Session = Depends
                 detail="Please provide at least one symptom"
             )
         
-        # Sort symptoms for consistent cache key
-        sorted_symptoms = sorted(symptoms.symptoms)
-        cache_key = ','.join(sorted_symptoms)
-        
-        # Check cache first
-        cached_result = prediction_cache.get(cache_key)
-        if cached_result:
-            return cached_result
-        
-        # Create feature vector using the template (avoid copying large arrays)
-        feature_vector = feature_vector_template.copy()
-        valid_symptoms = []
-        invalid_symptoms = []
+        # The whole request uses the model it started with, even if it is swapped meanwhile
+        model = _current_model()
+        columns, valid_symptoms, invalid_symptoms = model.symptom_index.resolve(symptoms.symptoms)
+        response = await _predict_from_columns(
+            model, columns, valid_symptoms, invalid_symptoms, len(symptoms.symptoms), db
+        )
+        _shadow_predict(background_tasks, valid_symptoms)
         
-        # Map symptoms to feature vector (optimized)
-        for symptom in symptoms.symptoms:
-            if symptom in model_symptoms:
-                feature_vector.at[0, symptom] = 1
-                valid_symptoms.append(symptom)
-            else:
-                invalid_symptoms.append(symptom)
+        return response
         
-        if not valid_symptoms:
+    except HTTPException as he:
+        raise he
+    except InferencePoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        print(f"Error in disease prediction: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error predicting disease: {str(e)}"
+        )
+
+@app.post("/api/predict/ids", response_model=schemas.PredictionResponse)
+async def predict_disease_by_ids(symptoms: schemas.SymptomIdsInput, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
+    try:
+        model = _current_model()
+        symptom_index = model.symptom_index
+        if symptoms.version is not None and symptoms.version != symptom_index.version:
             raise HTTPException(
-                status_code=400,
-                detail="No valid symptoms provided. Please check your symptom names."
+                status_code=409,
+                detail=f"Symptom IDs are for version {symptoms.version}, current version is {symptom_index.version}"
             )
-
-        # Get probabilities for all diseases using the model
-        probabilities = model.predict_proba(feature_vector)[0]
-        
-        # Get predictions with confidence scores
-        disease_probs = list(zip(label_encoder.classes_, probabilities))
         
-        # Define common mental health symptoms (moved outside the loop)
-        mental_health_symptoms = {
-            'anxiety', 'depression', 'insomnia', 'fatigue', 'mood swings', 
-            'irritability', 'stress', 'panic attacks', 'emotional', 'nervousness',
-            'anxiety and nervousness', 'depressive or psychotic symptoms'
-        }
-        
-        is_mental_health = any(s in mental_health_symptoms for s in valid_symptoms)
-        
-        # Filter and sort predictions (optimized)
-        relevant_predictions = []
-        for disease, prob in disease_probs:
-            if prob < 0.15:  # Early skip for low probability
-                continue
-                
+        if symptoms.bitmask is not None:
             try:
-                # Ensure disease is a string for processing
-                disease_str = str(disease) if not isinstance(disease, str) else disease
-                
-                # Get feature importances for this disease
-                disease_features = disease_features_cache.get(disease_str)
-                if disease_features is None:
-                    # If not in cache, use default importances
-                    disease_features = np.ones(len(model_symptoms)) / len(model_symptoms)
-                
-                # Get important symptoms with their importance scores
-                symptom_importance = [(sym, imp) for sym, imp in zip(model_symptoms, disease_features) if imp > 0.01]
-                
-                # Calculate symptom matches (optimized)
-                matching_symptoms = []
-                total_importance = 0
-                matched_importance = 0
-                
-                for sym, imp in symptom_importance:
-                    total_importance += imp
-                    if sym in valid_symptoms:
-                        matching_symptoms.append({"symptom": sym, "importance": float(imp)})
-                        matched_importance += imp
-                
-                if not matching_symptoms:
-                    continue
-                
-                # Calculate scores
-                symptom_coverage = matched_importance / total_importance if total_importance > 0 else 0
-                matching_count = len(matching_symptoms)
-                
-                # Adjust confidence for mental health conditions
-                adjusted_prob = prob
-                if is_mental_health:
-                    # Convert disease to string if it's not already
-                    if any(mh in disease_str.lower() for mh in ['anxiety', 'depression', 'stress', 'disorder', 'mental']):
-                        adjusted_prob *= 1.5
-                    else:
-                        adjusted_prob *= 0.5
-                
-                severity_score = matched_importance * adjusted_prob
-                
-                # Only include relevant predictions
-                if ((adjusted_prob >= 0.15 and symptom_coverage >= 0.3) or
-                    (matching_count >= 2 and adjusted_prob >= 0.4) or
-                    (is_mental_health and 
-                     any(mh in disease_str.lower() for mh in ['anxiety', 'depression', 'stress']) and 
-                     adjusted_prob >= 0.2)):
-                    
-                    relevant_predictions.append({
-                        "disease": disease_str,  # Ensure disease is a string
-                        "confidence": float(adjusted_prob),
-                        "matching_symptoms": matching_symptoms,
-                        "symptom_coverage": float(symptom_coverage),
-                        "severity_score": float(severity_score),
-                        "matching_count": matching_count
-                    })
-            except Exception as e:
-                print(f"Error processing disease {disease}: {str(e)}")
-                continue
-        
-        # Sort predictions by severity score and confidence
-        relevant_predictions.sort(key=lambda x: (x["severity_score"], x["confidence"]), reverse=True)
-        
-        # Take top 5 most relevant predictions
-        top_predictions = relevant_predictions[:5]
-        
-        if not top_predictions:
-            # Use pre-computed features for fallback
-            best_matches = []
-            for disease, prob in disease_probs:
-                if prob < 0.1:  # Skip very low probability matches
-                    continue
-                    
-                try:
-                    disease_str = str(disease) if not isinstance(disease, str) else disease
-                    disease_features = disease_features_cache.get(disease_str, np.ones(len(model_symptoms)) / len(model_symptoms))
-                    matching_count = sum(1 for sym, imp in zip(model_symptoms, disease_features) 
-                                      if imp > 0.01 and sym in valid_symptoms)
-                    
-                    if matching_count > 0:
-                        best_matches.append((disease_str, prob, matching_count))
-                except Exception as e:
-                    continue
-            
-            if best_matches:
-                best_matches.sort(key=lambda x: (x[2], x[1]), reverse=True)
-                best_disease = best_matches[0]
-                top_predictions = [{
-                    "disease": best_disease[0],
-                    "confidence": float(best_disease[1]),
-                    "matching_symptoms": [{"symptom": s, "importance": 0.01} for s in valid_symptoms],
-                    "symptom_coverage": float(best_disease[2]/len(valid_symptoms)),
-                    "severity_score": float(best_disease[1] * 0.1),
-                    "matching_count": best_disease[2]
-                }]
-            else:
-                top_disease = max(disease_probs, key=lambda x: x[1])
-                disease_str = str(top_disease[0]) if not isinstance(top_disease[0], str) else top_disease[0]
-                top_predictions = [{
-                    "disease": disease_str,
-                    "confidence": float(top_disease[1]),
-                    "matching_symptoms": [],
-                    "symptom_coverage": 0.0,
-                    "severity_score": float(top_disease[1] * 0.1),
-                    "matching_count": 0
-                }]
-
-        # Get recommended doctors (optimized query)
-        recommended_doctors = []
-        seen_doctors = set()
-        
-        # Prepare specialty lists for all predictions at once
-        all_specialties = set()
-        for pred in top_predictions:
-            try:
-                all_specialties.update(get_relevant_specialties(pred["disease"]))
-            except Exception as e:
-                print(f"Error getting specialties for {pred['disease']}: {str(e)}")
-                # Add default specialties
-                all_specialties.update(['Internal Medicine', 'Family Medicine', 'General Practice'])
-        
-        if is_mental_health:
-            all_specialties.update(['psychiatrist', 'psychologist', 'mental health specialist'])
-        
-        # Batch query for doctors
-        specialty_doctors = (
-            db.query(models.Doctor)
-            .filter(func.lower(models.Doctor.specialization).in_([s.lower() for s in all_specialties]))
-            .order_by(models.Doctor.rating.desc())
-            .limit(8)
-            .all()
-        )
-        
-        # Process doctors
-        for doctor in specialty_doctors:
-            if doctor.id not in seen_doctors:
-                doctor_dict = doctor.__dict__
-                doctor_dict["specialty_relevance"] = 1.0
-                recommended_doctors.append(doctor_dict)
-                seen_doctors.add(doctor.id)
-                
-                if len(recommended_doctors) >= 8:
-                    break
+                symptom_ids = symptom_index.decode_bitmask(symptoms.bitmask)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        else:
+            symptom_ids = symptoms.symptom_ids or []
         
-        # If we need more doctors, add general practitioners
-        if len(recommended_doctors) < 4:
-            additional_doctors = (
-                db.query(models.Doctor)
-                .filter(
-                    or_(
-                        func.lower(models.Doctor.specialization).in_([
-                            'internal medicine',
-                            'family medicine',
-                            'general practice'
-                        ])
-                    )
-                )
-                .order_by(models.Doctor.rating.desc())
-                .limit(8 - len(recommended_doctors))
-                .all()
+        if not symptom_ids:
+            raise HTTPException(
+                status_code=400,
+                detail="Please provide at least one symptom"
             )
-            
-            for doctor in additional_doctors:
-                if doctor.id not in seen_doctors:
-                    doctor_dict = doctor.__dict__
-                    doctor_dict["specialty_relevance"] = 0.1
-                    recommended_doctors.append(doctor_dict)
-                    seen_doctors.add(doctor.id)
-        
-        # Prepare response
-        response = {
-            "predictions": top_predictions,
-            "recommended_doctors": recommended_doctors,
-            "input_summary": {
-                "valid_symptoms": valid_symptoms,
-                "invalid_symptoms": invalid_symptoms,
-                "total_symptoms_provided": len(symptoms.symptoms),
-                "valid_symptoms_count": len(valid_symptoms)
-            }
-        }
         
-        # Cache the result
-        prediction_cache[cache_key] = response
+        columns, valid_symptoms, invalid_symptoms = symptom_index.resolve_ids(symptom_ids)
+        response = await _predict_from_columns(
+            model, columns, valid_symptoms, invalid_symptoms, len(symptom_ids), db
+        )
+        _shadow_predict(background_tasks, valid_symptoms)
         
         return response
         
     except HTTPException as he:
         raise he
+    except InferencePoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"Error in disease prediction: {str(e)}")
         raise HTTPException(
@@ -506,28 +612,378 @@ async def predict_disease(symptoms: schemas.SymptomsInput, db: Session = Depends
             detail=f"Error predicting disease: {str(e)}"
         )
 
+@app.post("/api/predict/batch")
+async def predict_batch(request: Request, include_doctors: bool = Query(False)):
+    """
+    Score many symptom sets and stream one NDJSON line per set as each chunk finishes.
+
+    Accepts a JSON body {"symptom_sets": [[...], ...]} or a multipart upload
+    ("file") in CSV or JSONL format, see batch_input.py. Bodies over
+    BULK_MAX_BODY_BYTES or with more than BULK_MAX_SYMPTOM_SETS sets get 413.
+    """
+    try:
+        body = await _read_body(request, BULK_MAX_BODY_BYTES)
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await _replay_request(request, body).form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Please upload a file field named 'file'")
+            symptom_sets = parse_symptom_file(await upload.read(), upload.filename or "")
+        else:
+            payload = schemas.BatchSymptomsInput.model_validate(json.loads(body))
+            symptom_sets = [{"id": None, "symptoms": symptoms} for symptoms in payload.symptom_sets]
+    except HTTPException as he:
+        raise he
+    except (ValidationError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not symptom_sets:
+        raise HTTPException(status_code=400, detail="Please provide at least one symptom set")
+    if len(symptom_sets) > BULK_MAX_SYMPTOM_SETS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BULK_MAX_SYMPTOM_SETS} symptom sets per request, got {len(symptom_sets)}"
+        )
+    
+    return StreamingResponse(
+        _stream_batch_predictions(_current_model(), symptom_sets, include_doctors),
+        media_type="application/x-ndjson"
+    )
+
+async def _read_body(request, max_bytes):
+    """The request body, or 413 as soon as it is known to exceed max_bytes."""
+    too_large = HTTPException(status_code=413, detail=f"Request body is larger than {max_bytes} bytes")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise too_large
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def _replay_request(request, body):
+    """A copy of request whose body is the already-read body (for form parsing)."""
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    return Request(request.scope, receive)
+
+async def _stream_batch_predictions(model, symptom_sets, include_doctors):
+    # The request-scoped session may be closed before streaming ends, so use our own
+    db = AsyncSessionLocal() if include_doctors else None
+    try:
+        for start in range(0, len(symptom_sets), BULK_CHUNK_SIZE):
+            chunk = symptom_sets[start:start + BULK_CHUNK_SIZE]
+            resolved = [model.symptom_index.resolve(entry["symptoms"]) for entry in chunk]
+            items = [model.scoring_item(columns) for columns, _, _ in resolved]
+            scorable = [row for row, item in enumerate(items) if item[1]]
+            scored = {}
+            if scorable:
+                # Bulk jobs wait for pool capacity rather than being rejected
+                results = await model.pool.run([items[row] for row in scorable], wait=True)
+                scored = dict(zip(scorable, results))
+            
+            lines = []
+            for row, entry in enumerate(chunk):
+                _, valid_symptoms, invalid_symptoms = resolved[row]
+                result = {
+                    "index": start + row,
+                    "id": entry["id"],
+                    "input_summary": {
+                        "valid_symptoms": valid_symptoms,
+                        "invalid_symptoms": invalid_symptoms,
+                        "total_symptoms_provided": len(entry["symptoms"]),
+                        "valid_symptoms_count": len(valid_symptoms)
+                    }
+                }
+                if row not in scored:
+                    result["error"] = "No valid symptoms provided"
+                else:
+                    result["predictions"] = scored[row]
+                    if include_doctors:
+                        # Doctors are resolved once per distinct specialty set
+                        specialties = _relevant_specialties(scored[row], items[row][2])
+                        result["recommended_doctors"] = await _cached_doctors(specialties, db)
+                lines.append(json.dumps(result) + "\n")
+            yield "".join(lines)
+    finally:
+        if db is not None:
+            await db.close()
+
+def _relevant_specialties(top_predictions, is_mental_health):
+    """Specialties relevant to any of the predicted diseases."""
+    # Prepare specialty lists for all predictions at once
+    all_specialties = set()
+    for pred in top_predictions:
+        try:
+            all_specialties.update(get_relevant_specialties(pred["disease"]))
+        except Exception as e:
+            print(f"Error getting specialties for {pred['disease']}: {str(e)}")
+            # Add default specialties
+            all_specialties.update(['Internal Medicine', 'Family Medicine', 'General Practice'])
+    
+    if is_mental_health:
+        all_specialties.update(['psychiatrist', 'psychologist', 'mental health specialist'])
+    
+    return all_specialties
+
+def _doctor_dict(doctor, specialty_relevance):
+    """Plain, JSON-ready copy of a doctor row, safe to cache across sessions."""
+    return {
+        **DoctorResponse.model_validate(doctor).model_dump(mode="json"),
+        "specialty_relevance": specialty_relevance
+    }
+
+async def _cached_doctors(all_specialties, db):
+    cache_key = frozenset(s.lower() for s in all_specialties)
+    recommended_doctors = doctor_cache.get(cache_key)
+    if recommended_doctors is None:
+        recommended_doctors = await _recommend_doctors(all_specialties, db)
+        doctor_cache.set(cache_key, recommended_doctors)
+    return recommended_doctors
+
+async def _recommend_doctors(all_specialties, db):
+    """Top rated doctors for the given specialties, topped up with general practitioners."""
+    recommended_doctors = []
+    seen_doctors = set()
+    
+    # Batch query for doctors
+    specialty_doctors = await db.scalars(
+        select(models.Doctor)
+        .where(func.lower(models.Doctor.specialization).in_([s.lower() for s in all_specialties]))
+        .order_by(models.Doctor.rating.desc())
+        .limit(8)
+    )
+    
+    # Process doctors
+    for doctor in specialty_doctors:
+        if doctor.id not in seen_doctors:
+            recommended_doctors.append(_doctor_dict(doctor, 1.0))
+            seen_doctors.add(doctor.id)
+            
+            if len(recommended_doctors) >= 8:
+                break
+    
+    # If we need more doctors, add general practitioners
+    if len(recommended_doctors) < 4:
+        additional_doctors = await db.scalars(
+            select(models.Doctor)
+            .where(
+                or_(
+                    func.lower(models.Doctor.specialization).in_([
+                        'internal medicine',
+                        'family medicine',
+                        'general practice'
+                    ])
+                )
+            )
+            .order_by(models.Doctor.rating.desc())
+            .limit(8 - len(recommended_doctors))
+        )
+        
+        for doctor in additional_doctors:
+            if doctor.id not in seen_doctors:
+                recommended_doctors.append(_doctor_dict(doctor, 0.1))
+                seen_doctors.add(doctor.id)
+    
+    return recommended_doctors
+
+async def _predict_from_columns(model, columns, valid_symptoms, invalid_symptoms, total_symptoms_provided, db):
+    """Run the model, scoring and doctor lookup for already-resolved symptom columns."""
+    if not valid_symptoms:
+        raise HTTPException(
+            status_code=400,
+            detail="No valid symptoms provided. Please check your symptom names."
+        )
+
+    # Predictions depend only on the set of valid symptoms, so that set is the
+    # cache key and the (column-ordered, de-duplicated) input to the model
+    item = model.scoring_item(columns)
+    is_mental_health = item[2]
+    top_predictions = model.cached_predictions(item)
+    if top_predictions is None:
+        # Score every disease at once and take the top 5 most relevant predictions;
+        # concurrent requests share one predict_proba pass through the batcher
+        top_predictions = await model.batcher.submit(item)
+        model.store_predictions(item, top_predictions)
+    
+    # Get recommended doctors (cached per specialty set)
+    all_specialties = _relevant_specialties(top_predictions, is_mental_health)
+    recommended_doctors = await _cached_doctors(all_specialties, db)
+    
+    # Prepare response
+    response = {
+        "predictions": top_predictions,
+        "recommended_doctors": recommended_doctors,
+        "input_summary": {
+            "valid_symptoms": valid_symptoms,
+            "invalid_symptoms": invalid_symptoms,
+            "total_symptoms_provided": total_symptoms_provided,
+            "valid_symptoms_count": len(valid_symptoms)
+        }
+    }
+    
+    return response
+
 # Admin endpoints
+# Fields each admin list can return; the response schemas never include passwords
+ADMIN_LIST_FIELDS = {
+    "doctors": list(schemas.DoctorResponse.model_fields),
+    "users": list(schemas.UserResponse.model_fields),
+    "messages": list(schemas.MessageResponse.model_fields),
+    "appointments": list(schemas.AppointmentResponse.model_fields),
+}
+
+def _admin_fields(resource, fields):
+    """Requested comma-separated fields of an admin list (id is always included)."""
+    allowed = ADMIN_LIST_FIELDS[resource]
+    if not fields:
+        return allowed
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields for {resource}: {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+    return ["id"] + [field for field in dict.fromkeys(requested) if field != "id"]
+
+async def _column_rows(db, model, fields, cursor, limit, newest_first):
+    """
+    One keyset page of a table as dicts of the selected columns.
+
+    Rows are ordered by id (newest first for messages and appointments) and
+    the page starts after the id in cursor, so every page is an index range
+    scan, however deep.
+    """
+    query = select(*[getattr(model, field) for field in fields])
+    if cursor is not None:
+        query = query.where(model.id < cursor if newest_first else model.id > cursor)
+    query = query.order_by(model.id.desc() if newest_first else model.id.asc())
+    result = await db.execute(query.limit(limit))
+    return [dict(row._mapping) for row in result]
+
+async def _admin_list(db, resource, fetch_rows, fields, cursor, limit, stream):
+    """
+    Page or export of an admin list.
+
+    A page is {"items", "next_cursor"}: pass next_cursor back as cursor for
+    the following page; it is null on the last one. With stream=true the
+    whole list from cursor on is streamed as one JSON array, read in batches.
+    """
+    fields = _admin_fields(resource, fields)
+    if stream:
+        return StreamingResponse(_stream_admin_list(fetch_rows, fields, cursor), media_type="application/json")
+
+    # One row more than the page tells whether there is a next page
+    rows = await fetch_rows(db, fields, cursor, limit + 1)
+    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    return {"items": jsonable_encoder(rows[:limit]), "next_cursor": next_cursor}
+
+async def _stream_admin_list(fetch_rows, fields, cursor):
+    # The request-scoped session may be closed before streaming ends, so use our own
+    db = AsyncSessionLocal()
+    try:
+        yield "["
+        first = True
+        while True:
+            rows = await fetch_rows(db, fields, cursor, EXPORT_BATCH_SIZE)
+            for row in rows:
+                yield ("" if first else ",") + json.dumps(jsonable_encoder(row))
+                first = False
+            if len(rows) < EXPORT_BATCH_SIZE:
+                break
+            cursor = rows[-1]["id"]
+            # Nothing from this batch is needed any more
+            db.expunge_all()
+        yield "]"
+    finally:
+        await db.close()
+
+def _admin_list_params(
+    cursor: Optional[int] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=ADMIN_MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    stream: bool = Query(False, description="Stream the whole list as a JSON array (exports)"),
+):
+    return {"cursor": cursor, "limit": limit, "fields": fields, "stream": stream}
+
 @app.get("/api/admin/doctors")
-async def get_all_doctors(db: Session = Depends(get_db)):
+async def get_all_doctors(params: dict = Depends(_admin_list_params), db: AsyncSession = Depends(get_async_db)):
     try:
-        doctors = db.query(models.Doctor).all()
-        return doctors
+        return await _admin_list(
+            db, "doctors",
+            lambda db, fields, cursor, limit: _column_rows(db, models.Doctor, fields, cursor, limit, newest_first=False),
+            **params
+        )
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/admin/users")
-async def get_all_users(db: Session = Depends(get_db)):
+async def get_all_users(params: dict = Depends(_admin_list_params), db: AsyncSession = Depends(get_async_db)):
     try:
-        users = db.query(models.User).all()
-        return users
+        return await _admin_list(
+            db, "users",
+            lambda db, fields, cursor, limit: _column_rows(db, models.User, fields, cursor, limit, newest_first=False),
+            **params
+        )
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/admin/batching")
+async def get_batching_stats():
+    return _current_model().batcher.stats()
+
+@app.get("/api/admin/inference-pool")
+async def get_inference_pool_stats():
+    return _current_model().pool.stats()
+
+@app.get("/api/admin/model")
+async def get_model_info():
+    return {**_current_model().info(), "watch_interval_seconds": MODEL_WATCH_INTERVAL}
+
+@app.post("/api/admin/model/reload")
+async def reload_model_files():
+    if model_reload_lock.locked():
+        raise HTTPException(status_code=409, detail="A model reload is already in progress")
+    try:
+        return await reload_model()
+    except Exception as e:
+        print(f"Error reloading model: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error reloading model: {str(e)}"
+        )
+
+@app.get("/api/admin/shadow")
+async def get_shadow_stats():
+    if shadow_runner is None:
+        return {"enabled": False, "candidate_source": SHADOW_MODEL_PATH}
+    return shadow_runner.stats()
+
+@app.get("/api/admin/cache")
+async def get_cache_stats():
+    model = _current_model()
+    return {
+        "model_version": model.version,
+        "predictions": prediction_cache.stats(),
+        "precomputed": model.prediction_table.stats() if model.prediction_table is not None else None,
+        "doctors": doctor_cache.stats(),
+        "doctor_search": doctor_search_index.stats() if doctor_search_index is not None else None
+    }
+
 @app.get("/api/admin/stats")
-async def get_admin_stats(db: Session = Depends(get_db)):
+async def get_admin_stats(db: AsyncSession = Depends(get_async_db)):
     try:
-        total_users = db.query(models.User).count()
-        total_doctors = db.query(models.Doctor).count()
+        total_users = await db.scalar(select(func.count()).select_from(models.User))
+        total_doctors = await db.scalar(select(func.count()).select_from(models.Doctor))
         
         return {
             "totalUsers": total_users,
@@ -537,87 +993,102 @@ async def get_admin_stats(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/admin/doctors")
-async def add_doctor(doctor: schemas.DoctorCreate, db: Session = Depends(get_db)):
+async def add_doctor(doctor: schemas.DoctorCreate, db: AsyncSession = Depends(get_async_db)):
     try:
         db_doctor = models.Doctor(**doctor.dict())
         db.add(db_doctor)
-        db.commit()
-        db.refresh(db_doctor)
+        await db.commit()
+        await db.refresh(db_doctor)
+        doctor_cache.clear()
+        await refresh_search_index_async(db)
         return db_doctor
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/admin/doctors/{doctor_id}")
-async def update_doctor(doctor_id: int, doctor: schemas.DoctorUpdate, db: Session = Depends(get_db)):
+async def update_doctor(doctor_id: int, doctor: schemas.DoctorUpdate, db: AsyncSession = Depends(get_async_db)):
     try:
-        db_doctor = db.query(models.Doctor).filter(models.Doctor.id == doctor_id).first()
+        db_doctor = await db.get(models.Doctor, doctor_id)
         if not db_doctor:
             raise HTTPException(status_code=404, detail="Doctor not found")
             
         for key, value in doctor.dict(exclude_unset=True).items():
             setattr(db_doctor, key, value)
             
-        db.commit()
-        db.refresh(db_doctor)
+        await db.commit()
+        await db.refresh(db_doctor)
+        doctor_cache.clear()
+        await refresh_search_index_async(db)
         return db_doctor
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/admin/doctors/{doctor_id}")
-async def delete_doctor(doctor_id: int, db: Session = Depends(get_db)):
+async def delete_doctor(doctor_id: int, db: AsyncSession = Depends(get_async_db)):
     try:
-        doctor = db.query(models.Doctor).filter(models.Doctor.id == doctor_id).first()
+        doctor = await db.get(models.Doctor, doctor_id)
         if not doctor:
             raise HTTPException(status_code=404, detail="Doctor not found")
             
-        db.delete(doctor)
-        db.commit()
+        await db.delete(doctor)
+        await db.commit()
+        doctor_cache.clear()
+        await refresh_search_index_async(db)
         return {"message": "Doctor deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/messages", response_model=schemas.MessageResponse)
-async def create_message(message: schemas.MessageCreate, db: Session = Depends(get_db)):
+async def create_message(message: schemas.MessageCreate, db: AsyncSession = Depends(get_async_db)):
     try:
         db_message = models.Message(**message.dict())
         db.add(db_message)
-        db.commit()
-        db.refresh(db_message)
+        await db.commit()
+        await db.refresh(db_message)
         return db_message
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/admin/messages", response_model=List[schemas.MessageResponse])
-async def get_all_messages(db: Session = Depends(get_db)):
+@app.get("/api/admin/messages")
+async def get_all_messages(params: dict = Depends(_admin_list_params), db: AsyncSession = Depends(get_async_db)):
     try:
-        messages = db.query(models.Message).order_by(models.Message.created_at.desc()).all()
-        return messages
+        return await _admin_list(
+            db, "messages",
+            lambda db, fields, cursor, limit: _column_rows(db, models.Message, fields, cursor, limit, newest_first=True),
+            **params
+        )
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/admin/messages/{message_id}")
-async def delete_message(message_id: int, db: Session = Depends(get_db)):
+async def delete_message(message_id: int, db: AsyncSession = Depends(get_async_db)):
     try:
-        message = db.query(models.Message).filter(models.Message.id == message_id).first()
+        message = await db.get(models.Message, message_id)
         if not message:
             raise HTTPException(status_code=404, detail="Message not found")
             
-        db.delete(message)
-        db.commit()
+        await db.delete(message)
+        await db.commit()
         return {"message": "Message deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/appointments", response_model=schemas.AppointmentResponse)
-async def create_appointment(appointment: schemas.AppointmentCreate, db: Session = Depends(get_db)):
+async def create_appointment(appointment: schemas.AppointmentCreate, db: AsyncSession = Depends(get_async_db)):
     try:
         print(f"Creating appointment for doctor ID: {appointment.doctorId}")
         
         # Check if doctor exists
-        doctor = db.query(models.Doctor).filter(models.Doctor.id == appointment.doctorId).first()
+        doctor = await db.get(models.Doctor, appointment.doctorId)
         if not doctor:
             raise HTTPException(status_code=404, detail="Doctor not found")
 
+        user = await db.get(models.User, appointment.userId)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
         # Create appointment
         db_appointment = models.Appointment(
             doctor_id=appointment.doctorId,
@@ -628,23 +1099,16 @@ async def create_appointment(appointment: schemas.AppointmentCreate, db: Session
         
         try:
             db.add(db_appointment)
-            db.commit()
-            db.refresh(db_appointment)
+            await db.commit()
+            await db.refresh(db_appointment)
             print(f"Appointment created successfully with ID: {db_appointment.id}")
             
-            # Create response with doctor information
-            appointment_response = {
-                "id": db_appointment.id,
-                "doctor_id": db_appointment.doctor_id,
-                "message": db_appointment.message,
-                "status": db_appointment.status,
-                "created_at": db_appointment.created_at,
-                "doctor": doctor
-            }
-            return appointment_response
+            # Create response with doctor and user information
+            db_appointment.doctor = doctor
+            return _appointment_dict(db_appointment, user)
             
         except Exception as db_error:
-            db.rollback()
+            await db.rollback()
             print(f"Database error: {str(db_error)}")
             raise HTTPException(
                 status_code=500,
@@ -660,36 +1124,51 @@ async def create_appointment(appointment: schemas.AppointmentCreate, db: Session
             detail=f"An unexpected error occurred: {str(e)}"
         )
 
-@app.get("/api/admin/appointments", response_model=List[schemas.AppointmentResponse])
-async def get_all_appointments(db: Session = Depends(get_db)):
+def _appointment_dict(appointment, user=None):
+    """AppointmentResponse fields of an appointment whose doctor (and user) are already loaded."""
+    user = user or appointment.user
+    return {
+        "id": appointment.id,
+        "doctor_id": appointment.doctor_id,
+        "user_id": appointment.user_id,
+        "message": appointment.message,
+        "status": appointment.status,
+        "created_at": appointment.created_at,
+        "doctor": appointment.doctor,
+        "user": {
+            "id": user.id,
+            "username": user.username,
+            "full_name": user.full_name,
+            "email": user.email
+        }
+    }
+
+async def _appointment_rows(db, fields, cursor, limit):
+    """One keyset page of appointments (newest first) with their doctor and user, as dicts."""
+    query = (
+        select(models.Appointment)
+        .join(models.Appointment.doctor)
+        .join(models.Appointment.user)
+        .options(contains_eager(models.Appointment.doctor), contains_eager(models.Appointment.user))
+    )
+    if cursor is not None:
+        query = query.where(models.Appointment.id < cursor)
+    appointments = await db.scalars(query.order_by(models.Appointment.id.desc()).limit(limit))
+    rows = []
+    for appointment in appointments:
+        row = _appointment_dict(appointment)
+        row["doctor"] = schemas.DoctorResponse.model_validate(row["doctor"]).model_dump()
+        rows.append({field: row[field] for field in fields})
+    return rows
+
+@app.get("/api/admin/appointments")
+async def get_all_appointments(params: dict = Depends(_admin_list_params), db: AsyncSession = Depends(get_async_db)):
     try:
-        appointments = db.query(models.Appointment).order_by(models.Appointment.created_at.desc()).all()
-        
-        # Fetch doctor and user information for each appointment
-        appointments_with_details = []
-        for appointment in appointments:
-            doctor = db.query(models.Doctor).filter(models.Doctor.id == appointment.doctor_id).first()
-            user = db.query(models.User).filter(models.User.id == appointment.user_id).first()
-            
-            if doctor and user:
-                appointment_dict = {
-                    "id": appointment.id,
-                    "doctor_id": appointment.doctor_id,
-                    "user_id": appointment.user_id,
-                    "message": appointment.message,
-                    "status": appointment.status,
-                    "created_at": appointment.created_at,
-                    "doctor": doctor,
-                    "user": {
-                        "id": user.id,
-                        "username": user.username,
-                        "full_name": user.full_name,
-                        "email": user.email
-                    }
-                }
-                appointments_with_details.append(appointment_dict)
-        
-        return appointments_with_details
+        # One joined query per page: appointments with their doctor and user
+        # (appointments whose doctor or user is gone are left out)
+        return await _admin_list(db, "appointments", _appointment_rows, **params)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         print(f"Error fetching admin appointments: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -698,10 +1177,10 @@ async def get_all_appointments(db: Session = Depends(get_db)):
 async def update_appointment_status(
     appointment_id: int,
     status: str = Query(..., description="New status for the appointment"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        appointment = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
+        appointment = await db.get(models.Appointment, appointment_id)
         if not appointment:
             raise HTTPException(status_code=404, detail="Appointment not found")
             
@@ -709,8 +1188,7 @@ async def update_appointment_status(
             raise HTTPException(status_code=400, detail="Invalid status")
             
         appointment.status = status
-        db.commit()
-        db.refresh(appointment)
+        await db.commit()
         return {"message": "Appointment status updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -762,89 +1240,45 @@ def get_doctors_by_symptom(symptom_id: int, db: Session = Depends(get_db)):
 
 @app.get("/doctors/search/", response_model=List[DoctorResponse])
 def search_doctors_by_symptom(query: str, db: Session = Depends(get_db)):
-    # Search for symptoms matching the query
-    symptoms = db.query(models.Symptom).filter(
-        models.Symptom.name.ilike(f"%{query}%")
-    ).all()
-    
-    if not symptoms:
-        return []
-    
-    # Get all specialties from matching symptoms
-    specialty_sets = []
-    for symptom in symptoms:
-        specialty_query = db.query(symptom_specialty.c.specialty).filter(
-            symptom_specialty.c.symptom_id == symptom.id
-        )
-        specialty_sets.append([row[0] for row in specialty_query.all()])
-    
-    # Flatten the specialty sets
-    specialties = list(set([s for subset in specialty_sets for s in subset]))
-    
-    # Find doctors matching any of these specialties
-    doctors = db.query(models.Doctor).filter(
-        models.Doctor.specialization.in_(specialties)
-    ).order_by(models.Doctor.rating.desc()).all()
-    
-    return doctors
+    # Doctors for the specialties of every symptom whose name contains the query,
+    # answered from the in-memory index (built here only if startup has not yet)
+    index = doctor_search_index or refresh_search_index(db)
+    return index.search(query)
 
 @app.get("/api/users/{user_id}/appointments", response_model=List[schemas.AppointmentResponse])
-async def get_user_appointments(user_id: int, db: Session = Depends(get_db)):
+async def get_user_appointments(user_id: int, db: AsyncSession = Depends(get_async_db)):
     try:
         # First verify the user exists
-        user = db.query(models.User).filter(models.User.id == user_id).first()
+        user = await db.get(models.User, user_id)
         if not user:
             raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
 
-        # Get all appointments for the user
-        appointments = db.query(models.Appointment).filter(
-            models.Appointment.user_id == user_id
-        ).order_by(models.Appointment.created_at.desc()).all()
+        # Get all appointments for the user, joined with their doctor in the same query
+        appointments = await db.scalars(
+            select(models.Appointment)
+            .join(models.Appointment.doctor)
+            .options(contains_eager(models.Appointment.doctor))
+            .where(models.Appointment.user_id == user_id)
+            .order_by(models.Appointment.created_at.desc())
+        )
         
-        # Fetch doctor and user information for each appointment
-        appointments_with_details = []
-        for appointment in appointments:
-            try:
-                doctor = db.query(models.Doctor).filter(models.Doctor.id == appointment.doctor_id).first()
-                if not doctor:
-                    print(f"Warning: Doctor with ID {appointment.doctor_id} not found for appointment {appointment.id}")
-                    continue
-                
-                appointment_dict = {
-                    "id": appointment.id,
-                    "doctor_id": appointment.doctor_id,
-                    "user_id": user_id,
-                    "message": appointment.message,
-                    "status": appointment.status,
-                    "created_at": appointment.created_at,
-                    "doctor": doctor,
-                    "user": {
-                        "id": user.id,
-                        "username": user.username,
-                        "full_name": user.full_name,
-                        "email": user.email
-                    }
-                }
-                appointments_with_details.append(appointment_dict)
-            except Exception as detail_error:
-                print(f"Error processing appointment {appointment.id}: {str(detail_error)}")
-                continue
+        appointments_with_details = [_appointment_dict(appointment, user) for appointment in appointments]
         
         return appointments_with_details
     except HTTPException as he:
         raise he
     except Exception as e:
         print(f"Error fetching appointments: {str(e)}")
-        db.rollback()  # Explicitly rollback on error
+        await db.rollback()  # Explicitly rollback on error
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching appointments: {str(e)}"
         )
 
 @app.get("/api/doctors/{doctor_id}", response_model=schemas.DoctorResponse)
-async def get_doctor(doctor_id: int, db: Session = Depends(get_db)):
+async def get_doctor(doctor_id: int, db: AsyncSession = Depends(get_async_db)):
     try:
-        doctor = db.query(models.Doctor).filter(models.Doctor.id == doctor_id).first()
+        doctor = await db.get(models.Doctor, doctor_id)
         if not doctor:
             raise HTTPException(status_code=404, detail="Doctor not found")
         return doctor
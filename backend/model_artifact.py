@@ -0,0 +1,177 @@
+"""
+Memory-mappable model artifact.
+
+A directory holding the compiled forest's node arrays and the CSR arrays of
+the class-conditional importance matrix as raw .npy files, plus a manifest.json with the format
+version, model version, classes and symptom list. Loading memory-maps the
+arrays read-only, so startup does no unpickling and every worker process
+shares the same pages through the OS page cache: the mapped forest pickles as
+its file paths, and each inference or shadow worker maps the files again
+instead of receiving a copy of the arrays.
+
+Export one from a joblib pickle with export_model_artifact.py. Re-exporting
+into a directory that running servers have mapped is safe: array files are
+named after a hash of their contents and never rewritten in place, and the
+manifest is swapped in with one atomic rename, so readers see either the old
+or the new set of arrays.
+"""
+import glob
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import sklearn
+from scipy import sparse
+
+from compiled_forest import CompiledForest
+
+ARTIFACT_FORMAT = 2
+MANIFEST_NAME = "manifest.json"
+FOREST_ARRAYS = ("feature", "threshold", "left", "right", "leaf_index", "leaf_values", "roots")
+IMPORTANCE_ARRAYS = {"importance_data": "data", "importance_indices": "indices", "importance_indptr": "indptr"}
+
+
+def file_digest(path):
+    """Short content hash of a model file, used as its version."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def is_artifact(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+class ModelArtifact:
+    """Everything the prediction path needs, backed by memory-mapped arrays."""
+
+    def __init__(self, forest, classes, symptoms, importance, manifest):
+        self.forest = forest
+        self.classes = classes
+        self.symptoms = symptoms
+        self.importance = importance
+        self.manifest = manifest
+        self.version = manifest["model_version"]
+
+
+def export_artifact(path, forest, classes, symptoms, importance, model_version, source=None):
+    """Write a fitted sklearn forest and its metadata as an artifact directory."""
+    compiled = CompiledForest.from_sklearn(forest)
+    importance = sparse.csr_matrix(importance, dtype=np.float64)
+    if compiled.n_features != len(symptoms):
+        raise ValueError(f"Forest has {compiled.n_features} features but {len(symptoms)} symptoms were given")
+    if compiled.n_classes != len(classes) or importance.shape != (len(classes), len(symptoms)):
+        raise ValueError("Classes, symptoms and importance matrix do not match the forest")
+
+    os.makedirs(path, exist_ok=True)
+    arrays = {name: getattr(compiled, name) for name in FOREST_ARRAYS}
+    arrays.update({name: getattr(importance, attribute) for name, attribute in IMPORTANCE_ARRAYS.items()})
+    files = {name: _write_array(path, name, np.ascontiguousarray(array)) for name, array in arrays.items()}
+
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "model_version": model_version,
+        "source": source,
+        "sklearn_version": sklearn.__version__,
+        "n_trees": compiled.n_trees,
+        "n_features": compiled.n_features,
+        "n_classes": compiled.n_classes,
+        "max_depth": compiled.max_depth,
+        "classes": [str(disease) for disease in classes],
+        "symptoms": [str(symptom) for symptom in symptoms],
+        "arrays": {
+            name: {"file": files[name], "dtype": str(array.dtype), "shape": list(array.shape)}
+            for name, array in arrays.items()
+        },
+    }
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    previous = _manifest_files(manifest_path)
+    # Switched last and atomically, so readers never see a half-exported model
+    _replace_atomically(manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+    _remove_unused_arrays(path, set(files.values()) | previous)
+    return manifest
+
+
+def _replace_atomically(target, write):
+    """Write a file next to target and rename it over target (mapped readers keep the old inode)."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _write_array(path, name, array):
+    """Save array as <name>.<content hash>.npy, never touching an existing file in place."""
+    digest = hashlib.sha1(f"{array.dtype}{array.shape}".encode())
+    digest.update(memoryview(array).cast("B"))
+    file_name = f"{name}.{digest.hexdigest()[:12]}.npy"
+    target = os.path.join(path, file_name)
+    if not os.path.exists(target):
+        _replace_atomically(target, lambda f: np.save(f, array))
+    return file_name
+
+
+def _manifest_files(manifest_path):
+    try:
+        with open(manifest_path) as f:
+            return {spec["file"] for spec in json.load(f)["arrays"].values()}
+    except (OSError, ValueError, KeyError):
+        return set()
+
+
+def _remove_unused_arrays(path, keep):
+    """
+    Delete array files of older exports, keeping the new and the previous one.
+
+    Servers that still have a deleted file mapped keep reading it until they
+    unmap it (the data lives on until the last mapping is gone).
+    """
+    for file_path in glob.glob(os.path.join(path, "*.npy")):
+        if os.path.basename(file_path) not in keep:
+            os.unlink(file_path)
+
+
+def load_artifact(path):
+    """Memory-map an artifact directory written by export_artifact."""
+    with open(os.path.join(path, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(
+            f"Unsupported model artifact format {manifest.get('format')}; re-export it with export_model_artifact.py"
+        )
+
+    arrays = {}
+    for name, spec in manifest["arrays"].items():
+        array = np.load(os.path.join(path, spec["file"]), mmap_mode="r")
+        if str(array.dtype) != spec["dtype"] or list(array.shape) != spec["shape"]:
+            raise ValueError(f"Artifact array {name} does not match the manifest")
+        arrays[name] = array
+
+    forest = CompiledForest(
+        **{name: arrays[name] for name in FOREST_ARRAYS},
+        max_depth=manifest["max_depth"],
+        n_features=manifest["n_features"],
+    )
+    forest.mapped_files = {
+        name: os.path.abspath(os.path.join(path, manifest["arrays"][name]["file"])) for name in FOREST_ARRAYS
+    }
+    return ModelArtifact(
+        forest=forest,
+        classes=np.array(manifest["classes"]),
+        symptoms=manifest["symptoms"],
+        importance=sparse.csr_matrix(
+            tuple(arrays[name] for name in IMPORTANCE_ARRAYS),
+            shape=(len(manifest["classes"]), len(manifest["symptoms"])),
+        ),
+        manifest=manifest,
+    )
@@ -57,6 +57,9 @@ class Appointment(Base):
     status = Column(String(20), server_default='pending', nullable=False)
     created_at = Column(DateTime, server_default=func.now())
 
+    doctor = relationship("Doctor")
+    user = relationship("User")
+
 class Symptom(Base):
     __tablename__ = "symptoms"
     
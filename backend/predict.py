@@ -1,18 +1,12 @@
 import numpy as np
-import pandas as pd
-import joblib
 import json
 from typing import List, Dict, Any
-from collections import defaultdict
 
-# Load model and related files
-model = joblib.load('models/random_forest_disease_model.pkl')
-label_encoder = joblib.load('models/label_encoder.pkl')
+from predictor import Predictor
 
-with open('models/symptoms.json', 'r') as f:
-    symptoms_data = json.load(f)
-    SYMPTOMS = [s['name'] for s in symptoms_data['symptoms']]
-    SYMPTOM_IMPORTANCE = {s['name']: s['importance'] for s in symptoms_data['symptoms']}
+# Load model and related files; the predictor validates the feature names once
+predictor = Predictor.load('models/random_forest_disease_model.pkl', symptoms_path='models/symptoms.json', lazy=True)
+SYMPTOMS = predictor.symptoms
 
 with open('models/model_metrics.json', 'r') as f:
     model_metrics = json.load(f)
@@ -29,30 +23,23 @@ def predict_diseases(symptoms: List[str]) -> Dict[str, Any]:
     and consideration of common conditions.
     """
     # Validate symptoms
-    valid_symptoms = [s for s in symptoms if s in SYMPTOMS]
+    columns, valid_symptoms, _ = predictor.symptom_index.resolve(symptoms)
     if not valid_symptoms:
         return {
             "error": "No valid symptoms provided",
             "valid_symptoms": SYMPTOMS
         }
     
-    # Create feature vector
-    feature_vector = pd.DataFrame(np.zeros((1, len(SYMPTOMS))), columns=SYMPTOMS)
-    for symptom in valid_symptoms:
-        feature_vector[symptom] = 1
-    
     # Get model predictions and probabilities
-    probabilities = model.predict_proba(feature_vector)[0]
+    probabilities = predictor.predict_proba([columns])[0]
     
-    # Calculate confidence scores with adjustments
+    # Calculate confidence scores with adjustments, skipping diseases whose
+    # probability is too low
     predictions = []
-    for idx, prob in enumerate(probabilities):
-        disease = label_encoder.classes_[idx]
+    for idx in np.flatnonzero(probabilities >= MIN_CONFIDENCE_THRESHOLD):
+        disease = predictor.classes[idx]
+        prob = probabilities[idx]
         
-        # Skip if probability is too low
-        if prob < MIN_CONFIDENCE_THRESHOLD:
-            continue
-            
         # Get disease metrics
         disease_info = DISEASE_METRICS.get(disease, {})
         precision = disease_info.get('precision', 0.5)
@@ -0,0 +1,180 @@
+"""
+Precomputed /api/predict results for every 1- and 2-symptom combination.
+
+The table is built offline for one model version (see build_prediction_table.py)
+and stored as a structured .npy file that the server memory-maps. Row
+j * (j + 1) // 2 + i holds the top predictions for symptom columns {i, j}
+(i <= j; i == j is the single symptom), so a lookup is one array index.
+
+Only the numbers that depend on the model are stored. Symptom names and
+importances of matching symptoms are filled in from the CandidateScorer at
+lookup time, which reproduces CandidateScorer.score output exactly.
+"""
+import json
+import os
+
+import numpy as np
+
+from scoring import MAX_PREDICTIONS
+
+TABLE_FORMAT = 1
+
+# How each stored prediction's matching_symptoms are rebuilt
+KIND_NONE = 0       # padding, no prediction in this slot
+KIND_SCORED = 1     # symptoms above the importance threshold, with their importance
+KIND_FALLBACK = 2   # fallback match: every input symptom at importance 0.01
+KIND_ARGMAX = 3     # fallback to the most probable disease: no matching symptoms
+
+ROW_DTYPE = np.dtype([
+    ("disease", np.int16, (MAX_PREDICTIONS,)),
+    ("kind", np.uint8, (MAX_PREDICTIONS,)),
+    ("matching_count", np.uint8, (MAX_PREDICTIONS,)),
+    ("confidence", np.float64, (MAX_PREDICTIONS,)),
+    ("symptom_coverage", np.float64, (MAX_PREDICTIONS,)),
+    ("severity_score", np.float64, (MAX_PREDICTIONS,)),
+])
+
+
+def table_size(n_symptoms):
+    return n_symptoms * (n_symptoms + 1) // 2
+
+
+def row_index(columns):
+    """Table row for a sorted list of one or two distinct columns."""
+    i, j = columns[0], columns[-1]
+    return j * (j + 1) // 2 + i
+
+
+def combinations(n_symptoms):
+    """Every 1- and 2-column input, in table row order."""
+    for j in range(n_symptoms):
+        for i in range(j):
+            yield [i, j]
+        yield [j]
+
+
+def table_paths(directory, model_version):
+    base = os.path.join(directory, f"predictions_{model_version}")
+    return base + ".npy", base + ".json"
+
+
+def encode_row(predictions, class_index):
+    """Pack one scored prediction list into a ROW_DTYPE record."""
+    row = np.zeros((), dtype=ROW_DTYPE)
+    row["disease"] = -1
+    for slot, prediction in enumerate(predictions):
+        if prediction["matching_count"] == 0:
+            kind = KIND_ARGMAX
+        elif any(m["importance"] == 0.01 for m in prediction["matching_symptoms"]):
+            # Scored matches are strictly above IMPORTANCE_THRESHOLD (0.01)
+            kind = KIND_FALLBACK
+        else:
+            kind = KIND_SCORED
+        row["disease"][slot] = class_index[prediction["disease"]]
+        row["kind"][slot] = kind
+        row["matching_count"][slot] = prediction["matching_count"]
+        row["confidence"][slot] = prediction["confidence"]
+        row["symptom_coverage"][slot] = prediction["symptom_coverage"]
+        row["severity_score"][slot] = prediction["severity_score"]
+    return row
+
+
+def build_table(score_batch, scoring_item, scorer, n_symptoms, batch_size=512):
+    """
+    Score every 1- and 2-symptom combination.
+
+    score_batch and scoring_item are the server's own functions, so the table
+    holds exactly what live inference would return.
+    """
+    if len(scorer.classes) > np.iinfo(np.int16).max:
+        raise ValueError("Too many classes for the prediction table format")
+    class_index = {disease: idx for idx, disease in enumerate(scorer.classes)}
+    table = np.zeros(table_size(n_symptoms), dtype=ROW_DTYPE)
+
+    pending = []
+    for columns in combinations(n_symptoms):
+        pending.append(scoring_item(columns))
+        if len(pending) == batch_size:
+            _store(table, pending, score_batch(pending), class_index)
+            pending = []
+    if pending:
+        _store(table, pending, score_batch(pending), class_index)
+    return table
+
+
+def _store(table, items, results, class_index):
+    for item, predictions in zip(items, results):
+        table[row_index(item[0])] = encode_row(predictions, class_index)
+
+
+def save_table(table, directory, model_version, symptom_index):
+    os.makedirs(directory, exist_ok=True)
+    table_path, manifest_path = table_paths(directory, model_version)
+    np.save(table_path, table)
+    with open(manifest_path, "w") as f:
+        json.dump({
+            "format": TABLE_FORMAT,
+            "model_version": model_version,
+            "symptom_version": symptom_index.version,
+            "n_symptoms": len(symptom_index),
+            "rows": len(table),
+        }, f, indent=2)
+    return table_path
+
+
+class PredictionTable:
+    """Memory-mapped lookup of precomputed predictions for one model version."""
+
+    def __init__(self, table, scorer):
+        self.table = table
+        self.scorer = scorer
+        self.hits = 0
+
+    @classmethod
+    def load(cls, directory, model_version, symptom_index, scorer):
+        """Return the table for this model version, or None if none was built."""
+        table_path, manifest_path = table_paths(directory, model_version)
+        if not os.path.exists(table_path) or not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != TABLE_FORMAT:
+            raise ValueError(f"Unsupported prediction table format {manifest.get('format')}")
+        if manifest.get("symptom_version") != symptom_index.version:
+            raise ValueError("Prediction table was built for a different symptom list")
+        table = np.load(table_path, mmap_mode="r")
+        if table.dtype != ROW_DTYPE or len(table) != table_size(len(symptom_index)):
+            raise ValueError(f"Prediction table {table_path} does not match the model")
+        return cls(table, scorer)
+
+    def covers(self, columns):
+        return 1 <= len(columns) <= 2
+
+    def lookup(self, columns, valid_symptoms):
+        """Predictions for sorted, de-duplicated columns (one or two of them)."""
+        row = self.table[row_index(columns)]
+        self.hits += 1
+        predictions = []
+        for slot in range(MAX_PREDICTIONS):
+            kind = int(row["kind"][slot])
+            if kind == KIND_NONE:
+                break
+            disease_idx = int(row["disease"][slot])
+            if kind == KIND_SCORED:
+                matching_symptoms = self.scorer.matching_symptoms(disease_idx, columns)
+            elif kind == KIND_FALLBACK:
+                matching_symptoms = [{"symptom": s, "importance": 0.01} for s in valid_symptoms]
+            else:
+                matching_symptoms = []
+            predictions.append({
+                "disease": self.scorer.classes[disease_idx],
+                "confidence": float(row["confidence"][slot]),
+                "matching_symptoms": matching_symptoms,
+                "symptom_coverage": float(row["symptom_coverage"][slot]),
+                "severity_score": float(row["severity_score"][slot]),
+                "matching_count": int(row["matching_count"][slot])
+            })
+        return predictions
+
+    def stats(self):
+        return {"rows": len(self.table), "bytes": self.table.nbytes, "hits": self.hits}
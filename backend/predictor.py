@@ -0,0 +1,387 @@
+"""
+Shared inference core: one loaded model version and everything derived from it.
+
+Used by the API (main.py), the standalone predict.py and the Streamlit app
+("new model/utils.py"), so model loading, symptom encoding, the inference
+engine, top-k selection and result caching work the same everywhere.
+
+Request handlers take the current Predictor once and use it for the whole
+request, so a model swap never mixes two versions within one response.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import joblib
+import numpy as np
+
+from batching import MicroBatcher
+from bitvector_forest import BitvectorForest
+from class_importance import CLASS_IMPORTANCE_FILE, class_importance_for_model
+from compiled_forest import BatchSizeRouter, CompiledForest
+from inference_pool import InferencePool
+from model_artifact import file_digest, is_artifact, load_artifact
+from prediction_table import PredictionTable
+from scoring import MENTAL_HEALTH_SYMPTOMS, CandidateScorer
+from symptom_index import SymptomIndex
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ENCODER_PATH = os.path.join(BASE_DIR, "..", "new model", "app", "label_encoder.pkl")
+DISEASES_LIST_PATH = os.path.join(BASE_DIR, "..", "diseases_list.json")
+
+# Batch size from which the sklearn model beats the compiled engines. Measured
+# with the bundled 100-tree model: compiled and sklearn break even at about
+# 130-160 rows, bitvector and sklearn at about 200-250 (300 rows: compiled
+# 26 ms, bitvector 19 ms, sklearn 16 ms).
+SKLEARN_MIN_ROWS = 160
+
+
+def _read_symptoms(path):
+    """Symptom names from a symptoms.json holding either names or {"name": ...} entries."""
+    with open(path, 'r') as f:
+        entries = json.load(f)['symptoms']
+    return [entry['name'] if isinstance(entry, dict) else entry for entry in entries]
+
+
+def _load_label_encoder(model, model_path):
+    """The label encoder saved next to the model, or the best available stand-in."""
+    print("Model bundle missing encoder, loading from separate file...")
+    # Prefer an encoder saved next to the model (train_filtered_model.py does that)
+    encoder_path = os.path.join(os.path.dirname(model_path), "label_encoder.pkl")
+    if not os.path.exists(encoder_path):
+        encoder_path = DEFAULT_ENCODER_PATH
+    try:
+        label_encoder = joblib.load(encoder_path)
+        print(f"Successfully loaded label encoder with {len(label_encoder.classes_)} classes")
+        return label_encoder
+    except Exception as e:
+        print(f"Error loading label encoder: {e}")
+
+    # Create a simple label encoder
+    from sklearn.preprocessing import LabelEncoder
+    label_encoder = LabelEncoder()
+    if hasattr(model, "classes_"):
+        label_encoder.classes_ = model.classes_
+        print(f"Created label encoder from model classes: {len(label_encoder.classes_)} classes")
+        return label_encoder
+
+    # Fallback to common disease names
+    print("Using fallback disease classes")
+    # Try to read from diseases_list.json
+    try:
+        with open(DISEASES_LIST_PATH, 'r') as f:
+            diseases_data = json.load(f)
+            diseases = [d["disease"] for d in diseases_data[:50]]  # Limit to first 50
+            label_encoder.classes_ = np.array(diseases)
+            print(f"Created label encoder with {len(diseases)} diseases from diseases_list.json")
+    except Exception as e:
+        print(f"Error loading diseases: {e}")
+        # Hardcoded fallback
+        label_encoder.classes_ = np.array([
+            "Common Cold", "Pneumonia", "Diabetes", "Hypertension",
+            "Arthritis", "Migraine", "Asthma", "Influenza",
+            "Hepatitis", "Dengue", "Tuberculosis", "Malaria",
+            "Typhoid", "Jaundice", "Chicken pox", "Measles"
+        ])
+        print(f"Created fallback label encoder with {len(label_encoder.classes_)} classes")
+    return label_encoder
+
+
+class Predictor:
+    """
+    Symptom index, inference engine, scorer, precomputed table and cache of one model version.
+
+    The engine and scorer are built by build_engine() and build_scorer() on
+    first use, or up front by prepare(). predict.py and the Streamlit app only
+    need predict_proba and top_k, so they never derive class importance.
+    """
+
+    def __init__(self, model_digest, symptoms, symptom_index, classes, build_engine, build_scorer,
+                 mental_health_symptoms=MENTAL_HEALTH_SYMPTOMS, prediction_table=None, source=None, cache=None):
+        # Identifies the model file alone; version also covers the scoring rules
+        self.model_digest = model_digest
+        self.symptoms = symptoms
+        self.symptom_index = symptom_index
+        self.classes = [str(disease) for disease in classes]
+        self._build_engine = build_engine
+        self._build_scorer = build_scorer
+        self._engine = None
+        self._scorer = None
+        self._version = None
+        self._lock = threading.RLock()
+        self.mental_health_symptoms = mental_health_symptoms
+        self.prediction_table = prediction_table
+        self.source = source
+        # Anything with get/set (cache.py); keys start with the model version
+        self.cache = cache
+        self.pool = None
+        self.batcher = None
+
+    @classmethod
+    def load(cls, model_path, artifact_path=None, symptoms_path=None, engine="compiled",
+             table_dir=None, mental_health_symptoms=MENTAL_HEALTH_SYMPTOMS, cache=None, lazy=False,
+             sklearn_min_rows=SKLEARN_MIN_ROWS):
+        """
+        Load a model and build everything scoring needs.
+
+        artifact_path: a memory-mapped export (export_model_artifact.py), used
+        instead of model_path when it holds one.
+        symptoms_path: symptom list for models that carry none; defaults to the
+        symptoms.json next to the model.
+        engine: "compiled" evaluates the forest from flat arrays, "bitvector" uses
+        per-symptom leaf bitmasks on top of them, "sklearn" uses model.predict_proba.
+        table_dir: where to look for a precomputed prediction table.
+        sklearn_min_rows: batches this large go to the sklearn model when the
+        engine is "compiled" or "bitvector" and one was loaded (0 never does).
+        lazy: compile the forest and load or derive class importance on first
+        use instead of here.
+        """
+        symptoms_path = symptoms_path or os.path.join(os.path.dirname(model_path), "symptoms.json")
+        print("Loading model files...")
+
+        if artifact_path and is_artifact(artifact_path):
+            # Exported arrays are memory-mapped: nothing to unpickle, and the pages
+            # are shared by every worker process through the OS page cache
+            artifact = load_artifact(artifact_path)
+            model_version = artifact.version
+            symptoms = artifact.symptoms
+            model_symptoms = artifact.symptoms
+            disease_classes = artifact.classes
+            symptom_index = SymptomIndex(model_symptoms)
+            symptom_index.check_model(artifact.forest)
+            forest = artifact.forest
+            importance_matrix = artifact.importance
+            source = artifact_path
+            print(f"Memory-mapped model artifact {artifact_path} (version {model_version}, {artifact.forest.n_trees} trees)")
+            if engine == "sklearn":
+                print("The model artifact has no sklearn model; using the compiled forest")
+        else:
+            print("Loading disease prediction model (this may take a moment)...")
+            model_bundle = joblib.load(model_path)
+            model_version = file_digest(model_path)
+            source = model_path
+            print(f"Model loaded successfully! (version {model_version})")
+
+            # A bundle dict holds model, encoder and symptoms; a bare model needs the other files
+            if not isinstance(model_bundle, dict):
+                model_bundle = {"model": model_bundle}
+            model = model_bundle.get("model")
+            label_encoder = model_bundle.get("encoder")
+            symptoms = model_bundle.get("symptoms")
+            if symptoms:
+                print(f"Loaded {len(symptoms)} symptoms from model bundle")
+            else:
+                symptoms = _read_symptoms(symptoms_path)
+                print(f"Loaded {len(symptoms)} symptoms from {os.path.basename(symptoms_path)}")
+            if label_encoder is None:
+                label_encoder = _load_label_encoder(model, model_path)
+
+            # Validate the model's features once; predictions then use bare NumPy rows
+            feature_names = getattr(model, "feature_names_in_", None)
+            model_symptoms = symptoms if feature_names is None else feature_names
+            symptom_index = SymptomIndex(model_symptoms)
+            symptom_index.check_model(model)
+
+            # Anything with predict_proba can serve; the sklearn model is the fallback
+            forest = model
+            disease_classes = label_encoder.classes_
+            importance_matrix = None
+
+        def build_engine():
+            inference_engine = forest
+            if engine in ("compiled", "bitvector") and not isinstance(forest, CompiledForest):
+                try:
+                    inference_engine = CompiledForest.from_sklearn(forest)
+                    print(f"Compiled {inference_engine.n_trees} trees into flat arrays")
+                except Exception as e:
+                    print(f"Could not compile model, falling back to sklearn: {e}")
+            if engine == "bitvector" and isinstance(inference_engine, CompiledForest):
+                try:
+                    inference_engine = BitvectorForest.from_compiled(inference_engine)
+                    print("Built per-symptom leaf bitmasks for the bitvector engine")
+                except Exception as e:
+                    print(f"Could not build bitvector engine, using compiled forest: {e}")
+            if sklearn_min_rows > 0 and inference_engine is not forest and not isinstance(forest, CompiledForest):
+                inference_engine = BatchSizeRouter(inference_engine, forest, sklearn_min_rows)
+                print(f"Batches of {sklearn_min_rows} or more rows use the sklearn model")
+            return inference_engine
+
+        def build_scorer():
+            # Sparse (n_classes x n_symptoms) class-conditional importance saved by training
+            disease_importance_matrix = importance_matrix
+            if disease_importance_matrix is None:
+                disease_importance_matrix = class_importance_for_model(
+                    forest, disease_classes, model_symptoms,
+                    os.path.join(os.path.dirname(model_path), CLASS_IMPORTANCE_FILE),
+                )
+            return CandidateScorer(disease_classes, model_symptoms, disease_importance_matrix)
+
+        predictor = cls(
+            model_digest=model_version,
+            symptoms=symptoms,
+            symptom_index=symptom_index,
+            classes=disease_classes,
+            build_engine=build_engine,
+            build_scorer=build_scorer,
+            mental_health_symptoms=mental_health_symptoms,
+            source=source,
+            cache=cache,
+        )
+        if not lazy:
+            predictor.prepare()
+
+        if table_dir:
+            try:
+                predictor.prediction_table = PredictionTable.load(
+                    table_dir, predictor.version, symptom_index, predictor.scorer
+                )
+            except Exception as e:
+                print(f"Ignoring prediction table: {e}")
+            if predictor.prediction_table is not None:
+                print(f"Memory-mapped {len(predictor.prediction_table.table)} precomputed 1- and 2-symptom predictions")
+            else:
+                print("No precomputed prediction table for this model version; run build_prediction_table.py to create one")
+
+        print(f"Initialized prediction system with {len(model_symptoms)} features")
+        return predictor
+
+    def __getstate__(self):
+        # What an inference worker needs to score: no cache, pool or precomputed table
+        self.prepare()
+        state = self.__dict__.copy()
+        state.update(cache=None, pool=None, batcher=None, prediction_table=None,
+                     _build_engine=None, _build_scorer=None, _lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def _built(self, name, build):
+        value = getattr(self, name)
+        if value is None:
+            with self._lock:
+                value = getattr(self, name)
+                if value is None:
+                    value = build()
+                    setattr(self, name, value)
+        return value
+
+    @property
+    def engine(self):
+        return self._built("_engine", self._build_engine)
+
+    @property
+    def scorer(self):
+        return self._built("_scorer", self._build_scorer)
+
+    @property
+    def version(self):
+        """Cached and precomputed predictions depend on the importance matrix and scoring rules as well as the model file."""
+        return self._built(
+            "_version",
+            lambda: hashlib.sha1(f"{self.model_digest}:{self.scorer.fingerprint}".encode()).hexdigest()[:12],
+        )
+
+    def prepare(self):
+        """Build the engine, scorer and version now rather than on first use."""
+        for name in ("engine", "scorer", "version"):
+            getattr(self, name)
+        return self
+
+    def scoring_item(self, columns):
+        """Canonical (columns, symptom names, is_mental_health) scoring input for a symptom set."""
+        columns = sorted(set(columns))
+        canonical_symptoms = [self.symptom_index.name(col) for col in columns]
+        is_mental_health = any(s in self.mental_health_symptoms for s in canonical_symptoms)
+        return columns, canonical_symptoms, is_mental_health
+
+    def predict_proba(self, column_sets):
+        """Class probabilities for many column sets, in one engine pass."""
+        return self.engine.predict_proba(self.symptom_index.encode_many(column_sets))
+
+    def top_k(self, symptom_sets, k=3):
+        """
+        The k most probable (disease, probability) pairs for each list of symptom names.
+
+        Unknown names are ignored. Inputs missing from the cache are scored in
+        one predict_proba pass. Results depend on the model file alone, so
+        they are cached under model_digest and never build the scorer.
+        """
+        column_sets = [sorted(set(self.symptom_index.resolve(symptoms)[0])) for symptoms in symptom_sets]
+        results = [None] * len(column_sets)
+        if self.cache is not None:
+            for row, columns in enumerate(column_sets):
+                cached = self.cache.get((self.model_digest, "top_k", k, tuple(columns)))
+                if cached is not None:
+                    results[row] = [(disease, probability) for disease, probability in cached]
+
+        missing = [row for row, result in enumerate(results) if result is None]
+        if missing:
+            probabilities = self.predict_proba([column_sets[row] for row in missing])
+            for row, top in zip(missing, self.rank(probabilities, k)):
+                results[row] = top
+                if self.cache is not None:
+                    self.cache.set((self.model_digest, "top_k", k, tuple(column_sets[row])), top)
+        return results
+
+    def rank(self, probabilities, k):
+        """
+        (disease, probability) pairs of the k largest probabilities in each row.
+
+        Same order as the Streamlit app's original argsort(probs)[::-1], so
+        tied classes keep their old order in its top 3.
+        """
+        top = np.argsort(probabilities, axis=1)[:, ::-1][:, :k]
+        return [
+            [(self.classes[idx], float(row_probabilities[idx])) for idx in class_indices]
+            for class_indices, row_probabilities in zip(top, probabilities)
+        ]
+
+    def score_batch(self, items):
+        """Run one predict_proba pass for a batch of (columns, valid_symptoms, is_mental_health)."""
+        feature_matrix = self.symptom_index.encode_many([columns for columns, _, _ in items])
+        probabilities = self.engine.predict_proba(feature_matrix)
+        return [
+            self.scorer.score(probabilities[row], feature_matrix[row], valid_symptoms, is_mental_health)
+            for row, (_, valid_symptoms, is_mental_health) in enumerate(items)
+        ]
+
+    def precomputed(self, item):
+        """Precomputed predictions for a scoring item, or None if the table does not cover it."""
+        if self.prediction_table is not None and self.prediction_table.covers(item[0]):
+            return self.prediction_table.lookup(item[0], item[1])
+        return None
+
+    def cached_predictions(self, item):
+        """Scored predictions for a scoring item from the table or the cache, or None."""
+        predictions = self.precomputed(item)
+        if predictions is None and self.cache is not None:
+            predictions = self.cache.get((self.version, tuple(item[0])))
+        return predictions
+
+    def store_predictions(self, item, predictions):
+        if self.cache is not None:
+            self.cache.set((self.version, tuple(item[0])), predictions)
+
+    def start(self, workers, max_queue, max_batch, window_ms):
+        """Start the inference workers (each gets this model's scoring state) and set up micro-batching."""
+        self.pool = InferencePool(self.score_batch, workers=workers, max_queue=max_queue)
+        self.batcher = MicroBatcher(self.pool.run, max_batch=max_batch, window_ms=window_ms)
+        self.pool.start()
+
+    def close(self):
+        """Stop the workers; requests still holding this model finish inline."""
+        if self.pool is not None:
+            self.pool.close()
+
+    def info(self):
+        return {
+            "version": self.version,
+            "source": self.source,
+            "symptoms": len(self.symptom_index),
+            "symptom_version": self.symptom_index.version,
+            "engine": getattr(self.engine, "name", type(self.engine).__name__),
+            "precomputed_table": self.prediction_table is not None,
+        }
@@ -36,6 +36,14 @@ class LoginResponse(BaseModel):
 class SymptomsInput(BaseModel):
     symptoms: List[str]
 
+class SymptomIdsInput(BaseModel):
+    symptom_ids: Optional[List[int]] = None
+    bitmask: Optional[str] = None  # base64, bit i (little-endian) = symptom ID i
+    version: Optional[str] = None  # symptom index version from /api/symptoms
+
+class BatchSymptomsInput(BaseModel):
+    symptom_sets: List[List[str]]
+
 class DoctorResponse(BaseModel):
     id: int
     name: str
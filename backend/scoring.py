@@ -0,0 +1,202 @@
+"""
+Vectorized candidate scoring for /api/predict.
+
+The scoring rules (probability floor, importance threshold, symptom coverage,
+mental-health adjustment, severity score and top-5 selection) are evaluated as
+NumPy operations over a precomputed (n_classes x n_symptoms) importance matrix
+instead of a Python loop over every disease.
+
+The matrix is held in CSR form with only the entries above the importance
+threshold, so finding the matching symptoms of the candidate diseases is one
+binary search of the (disease, symptom) pairs over the stored entries.
+"""
+import hashlib
+
+import numpy as np
+from scipy import sparse
+
+# Scoring constants
+MIN_PROBABILITY = 0.15
+FALLBACK_MIN_PROBABILITY = 0.1
+IMPORTANCE_THRESHOLD = 0.01
+MAX_PREDICTIONS = 5
+
+MENTAL_HEALTH_KEYWORDS = ['anxiety', 'depression', 'stress', 'disorder', 'mental']
+CORE_MENTAL_HEALTH_KEYWORDS = ['anxiety', 'depression', 'stress']
+
+# Common mental health symptoms
+MENTAL_HEALTH_SYMPTOMS = {
+    'anxiety', 'depression', 'insomnia', 'fatigue', 'mood swings', 
+    'irritability', 'stress', 'panic attacks', 'emotional', 'nervousness',
+    'anxiety and nervousness', 'depressive or psychotic symptoms'
+}
+
+
+def _running_total(matrix):
+    """Row sums accumulated left to right, matching a plain Python loop bit for bit."""
+    if matrix.shape[1] == 0:
+        return np.zeros(matrix.shape[0])
+    return np.cumsum(matrix, axis=1)[:, -1]
+
+
+class CandidateScorer:
+    """Scores every disease for one input in a handful of array operations."""
+
+    def __init__(self, classes, symptoms, importance_matrix):
+        self.classes = [str(disease) for disease in classes]
+        self.symptoms = [str(symptom) for symptom in symptoms]
+
+        importance = sparse.csr_matrix(importance_matrix, dtype=np.float64, copy=True)
+        if importance.shape != (len(self.classes), len(self.symptoms)):
+            raise ValueError(
+                f"Importance matrix has shape {importance.shape}, "
+                f"expected {(len(self.classes), len(self.symptoms))}"
+            )
+
+        # Only symptoms above the threshold count towards a disease, so only
+        # those are kept; every stored entry is an important symptom.
+        importance.data[~(importance.data > IMPORTANCE_THRESHOLD)] = 0.0
+        importance.eliminate_zeros()
+        importance.sort_indices()
+        self.importance = importance
+        # Left-to-right sums over the stored entries equal the dense row sums
+        # bit for bit, since the skipped entries are all zero
+        self.total_importance = np.array([
+            _running_total(importance.data[start:end][np.newaxis, :])[0]
+            for start, end in zip(importance.indptr[:-1], importance.indptr[1:])
+        ])
+        # Row-major flat position of every stored entry; sorted, because the CSR
+        # rows are in order and their indices are sorted, so one binary search
+        # finds any (disease, symptom) pair
+        self._keys = (
+            np.repeat(np.arange(importance.shape[0], dtype=np.int64), np.diff(importance.indptr)) * importance.shape[1]
+            + importance.indices
+        )
+        self.fingerprint = self._fingerprint()
+
+        lowered = [disease.lower() for disease in self.classes]
+        self.is_mental_health_disease = np.array(
+            [any(mh in disease for mh in MENTAL_HEALTH_KEYWORDS) for disease in lowered], dtype=bool
+        )
+        self.is_core_mental_health_disease = np.array(
+            [any(mh in disease for mh in CORE_MENTAL_HEALTH_KEYWORDS) for disease in lowered], dtype=bool
+        )
+
+    def _fingerprint(self):
+        """Short hash of everything that determines scoring output, for cache keys."""
+        digest = hashlib.sha1()
+        digest.update(repr((MIN_PROBABILITY, FALLBACK_MIN_PROBABILITY, IMPORTANCE_THRESHOLD, MAX_PREDICTIONS,
+                            MENTAL_HEALTH_KEYWORDS, CORE_MENTAL_HEALTH_KEYWORDS,
+                            self.classes, self.symptoms)).encode())
+        for array in (self.importance.data, self.importance.indices, self.importance.indptr):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()[:12]
+
+    def importance_rows(self, diseases, columns):
+        """Dense (len(diseases) x len(columns)) importances, zero where a symptom is not important."""
+        queries = np.asarray(diseases, dtype=np.int64)[:, np.newaxis] * len(self.symptoms) + np.asarray(columns, dtype=np.int64)
+        if self._keys.size == 0:
+            return np.zeros(queries.shape)
+        position = np.minimum(np.searchsorted(self._keys, queries), self._keys.size - 1)
+        return np.where(self._keys[position] == queries, self.importance.data[position], 0.0)
+
+    def matching_symptoms(self, disease_idx, columns):
+        """matching_symptoms entries of a scored prediction for one disease."""
+        values = self.importance_rows([disease_idx], columns)[0]
+        return [
+            {"symptom": self.symptoms[col], "importance": float(value)}
+            for col, value in zip(columns, values) if value > 0
+        ]
+
+    def score(self, probabilities, input_vector, valid_symptoms, is_mental_health):
+        """
+        Return the top predictions for one input.
+
+        probabilities: predict_proba output for the input row.
+        input_vector: binary vector over the model symptoms.
+        valid_symptoms: recognised symptom names as provided by the caller.
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        columns = np.flatnonzero(input_vector)
+
+        top_predictions = self._score_candidates(probabilities, columns, is_mental_health)
+        if not top_predictions:
+            top_predictions = self._fallback(probabilities, columns, valid_symptoms)
+        return top_predictions
+
+    def _score_candidates(self, probabilities, columns, is_mental_health):
+        candidates = np.flatnonzero(probabilities >= MIN_PROBABILITY)
+        if candidates.size == 0:
+            return []
+
+        importance = self.importance_rows(candidates, columns)
+        important = importance > 0
+        matched_importance = _running_total(importance)
+        matching_count = important.sum(axis=1)
+        total_importance = self.total_importance[candidates]
+
+        symptom_coverage = np.zeros(candidates.size)
+        np.divide(matched_importance, total_importance, out=symptom_coverage, where=total_importance > 0)
+
+        prob = probabilities[candidates]
+        adjusted_prob = prob
+        if is_mental_health:
+            adjusted_prob = np.where(self.is_mental_health_disease[candidates], prob * 1.5, prob * 0.5)
+
+        severity_score = matched_importance * adjusted_prob
+
+        relevant = (
+            ((adjusted_prob >= 0.15) & (symptom_coverage >= 0.3))
+            | ((matching_count >= 2) & (adjusted_prob >= 0.4))
+            | (is_mental_health & self.is_core_mental_health_disease[candidates] & (adjusted_prob >= 0.2))
+        )
+        relevant &= matching_count > 0
+
+        rows = np.flatnonzero(relevant)
+        # lexsort is stable, so ties keep class order just like list.sort(reverse=True)
+        order = rows[np.lexsort((-adjusted_prob[rows], -severity_score[rows]))][:MAX_PREDICTIONS]
+
+        top_predictions = []
+        for row in order:
+            disease_idx = candidates[row]
+            top_predictions.append({
+                "disease": self.classes[disease_idx],
+                "confidence": float(adjusted_prob[row]),
+                "matching_symptoms": [
+                    {"symptom": self.symptoms[col], "importance": float(value)}
+                    for col, value in zip(columns, importance[row]) if value > 0
+                ],
+                "symptom_coverage": float(symptom_coverage[row]),
+                "severity_score": float(severity_score[row]),
+                "matching_count": int(matching_count[row])
+            })
+        return top_predictions
+
+    def _fallback(self, probabilities, columns, valid_symptoms):
+        candidates = np.flatnonzero(probabilities >= FALLBACK_MIN_PROBABILITY)
+        matching_count = (self.importance_rows(candidates, columns) > 0).sum(axis=1)
+        matched = np.flatnonzero(matching_count > 0)
+
+        if matched.size:
+            prob = probabilities[candidates[matched]]
+            best = matched[np.lexsort((-prob, -matching_count[matched]))[0]]
+            disease_idx = candidates[best]
+            count = int(matching_count[best])
+            return [{
+                "disease": self.classes[disease_idx],
+                "confidence": float(probabilities[disease_idx]),
+                "matching_symptoms": [{"symptom": s, "importance": 0.01} for s in valid_symptoms],
+                "symptom_coverage": float(count / len(valid_symptoms)),
+                "severity_score": float(probabilities[disease_idx] * 0.1),
+                "matching_count": count
+            }]
+
+        disease_idx = int(np.argmax(probabilities))
+        return [{
+            "disease": self.classes[disease_idx],
+            "confidence": float(probabilities[disease_idx]),
+            "matching_symptoms": [],
+            "symptom_coverage": 0.0,
+            "severity_score": float(probabilities[disease_idx] * 0.1),
+            "matching_count": 0
+        }]
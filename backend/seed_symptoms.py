@@ -226,6 +226,7 @@ def seed_symptoms():
         
         db.commit()
         print(f"Successfully added {len(added_symptoms)} symptoms")
+        print("A running API server picks these up at its next doctor search index refresh (SEARCH_INDEX_REFRESH_INTERVAL)")
         
     except Exception as e:
         print(f"An error occurred: {str(e)}")
@@ -0,0 +1,210 @@
+"""
+Shadow inference of a candidate model on a sample of live /api/predict inputs.
+
+Sampled inputs are scored by both the serving model and the candidate in one
+lowest-priority (nice 19) worker process, started from the same forkserver as
+the inference workers, after the response has been sent. Work is dropped rather than queued when the worker is busy or the
+shadow CPU budget (a fraction of one core, averaged over time) is used up, so
+user-facing requests never wait on it.
+
+Both models see the same symptom names, each resolved against its own symptom
+list, and are compared by disease name, so models trained on different
+datasets can be compared.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from inference_pool import START_METHOD, mp_context
+
+TOP_K = 5
+
+# (serving model, candidate), set in the worker by its initializer
+_models = None
+
+
+def _init_worker(primary, candidate):
+    global _models
+    os.nice(19)
+    _models = (primary, candidate)
+
+
+def _top_diseases(model, symptoms):
+    """Top-k disease names for one input, and the predict_proba wall time in ms."""
+    columns, _, _ = model.symptom_index.resolve(symptoms)
+    start = time.perf_counter()
+    probabilities = model.predict_proba([columns])
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return [disease for disease, _ in model.rank(probabilities, TOP_K)[0]], elapsed_ms
+
+
+def _shadow_job(symptoms):
+    primary, candidate = _models
+    cpu_start = time.process_time()
+    primary_top, primary_ms = _top_diseases(primary, symptoms)
+    candidate_top, candidate_ms = _top_diseases(candidate, symptoms)
+    return {
+        "primary_top": primary_top,
+        "candidate_top": candidate_top,
+        "primary_ms": primary_ms,
+        "candidate_ms": candidate_ms,
+        "cpu_seconds": time.process_time() - cpu_start,
+    }
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50_ms": None, "p99_ms": None}
+    return {"p50_ms": float(np.percentile(values, 50)), "p99_ms": float(np.percentile(values, 99))}
+
+
+class ShadowRunner:
+    """Compares a candidate Predictor with the serving one on sampled inputs."""
+
+    def __init__(self, candidate, sample_rate=0.05, cpu_budget=0.1, max_pending=2, window=1000):
+        self.candidate = candidate
+        self.sample_rate = float(sample_rate)
+        self.cpu_budget = float(cpu_budget)
+        self.max_pending = max(1, int(max_pending))
+        self.primary_version = None
+        self._primary = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        # Token bucket of CPU seconds, refilled at cpu_budget per wall-clock second
+        self._allowance = self.cpu_budget
+        self._refilled_at = time.monotonic()
+
+        self.samples = 0
+        self.top1_agreements = 0
+        self.top5_overlap_total = 0.0
+        self.cpu_seconds = 0.0
+        self.dropped = {"busy": 0, "budget": 0, "restarting": 0}
+        self.errors = 0
+        self.restarts = 0
+        self.primary_latency = deque(maxlen=window)
+        self.candidate_latency = deque(maxlen=window)
+
+    def start(self, primary):
+        """(Re)start the shadow worker with the given serving model and the candidate."""
+        if mp_context() is None:
+            print(f"Shadow inference needs the '{START_METHOD}' start method; disabled")
+            return
+        self.shutdown()
+        self._primary = primary
+        self.primary_version = primary.version
+        self._executor = self._new_executor()
+        print(f"Shadowing model {primary.version} with candidate {self.candidate.version}")
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=mp_context(),
+            initializer=_init_worker,
+            initargs=(self._primary, self.candidate),
+        )
+
+    def _restart(self, broken):
+        """Replace a broken worker pool (runs in its own thread, off the request path)."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        executor = self._new_executor()
+        with self._lock:
+            if self._primary is None or self._executor is not None:
+                # Shut down or restarted meanwhile
+                executor.shutdown(wait=False, cancel_futures=True)
+                return
+            self._executor = executor
+            self.restarts += 1
+        print("Shadow worker died; restarted it")
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._primary = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def sample(self):
+        return self._primary is not None and random.random() < self.sample_rate
+
+    def submit(self, symptoms):
+        """Queue one input for shadow scoring unless the worker is busy or over budget."""
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(
+                self.cpu_budget, self._allowance + (now - self._refilled_at) * self.cpu_budget
+            )
+            self._refilled_at = now
+            if self._pending >= self.max_pending:
+                self.dropped["busy"] += 1
+                return
+            if self._allowance <= 0:
+                self.dropped["budget"] += 1
+                return
+            executor = self._executor
+            if executor is None:
+                self.dropped["restarting"] += 1
+                return
+            self._pending += 1
+        try:
+            future = executor.submit(_shadow_job, list(symptoms))
+        except Exception as e:
+            with self._lock:
+                self._pending -= 1
+                self.errors += 1
+            self._restart_if_broken(executor, e)
+            return
+        future.add_done_callback(lambda future: self._record(executor, future))
+
+    def _restart_if_broken(self, executor, error):
+        if isinstance(error, BrokenProcessPool):
+            threading.Thread(target=self._restart, args=(executor,), daemon=True).start()
+
+    def _record(self, executor, future):
+        error = None if future.cancelled() else future.exception()
+        if error is not None:
+            self._restart_if_broken(executor, error)
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or error is not None:
+                self.errors += 1
+                return
+            result = future.result()
+            self._allowance -= result["cpu_seconds"]
+            self.cpu_seconds += result["cpu_seconds"]
+            self.samples += 1
+            primary_top, candidate_top = result["primary_top"], result["candidate_top"]
+            self.top1_agreements += primary_top[0] == candidate_top[0]
+            self.top5_overlap_total += len(set(primary_top) & set(candidate_top)) / TOP_K
+            self.primary_latency.append(result["primary_ms"])
+            self.candidate_latency.append(result["candidate_ms"])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self._primary is not None,
+                "primary_version": self.primary_version,
+                "candidate_version": self.candidate.version,
+                "candidate_source": self.candidate.source,
+                "sample_rate": self.sample_rate,
+                "cpu_budget": self.cpu_budget,
+                "samples": self.samples,
+                "top1_agreement": self.top1_agreements / self.samples if self.samples else None,
+                "top5_overlap": self.top5_overlap_total / self.samples if self.samples else None,
+                "primary_latency": _percentiles(list(self.primary_latency)),
+                "candidate_latency": _percentiles(list(self.candidate_latency)),
+                "cpu_seconds": self.cpu_seconds,
+                "dropped": dict(self.dropped),
+                "errors": self.errors,
+                "restarts": self.restarts,
+            }
@@ -0,0 +1,120 @@
+"""
+Symptom name <-> model column index, built once when the model is loaded.
+"""
+import base64
+import binascii
+import hashlib
+import warnings
+
+import numpy as np
+
+# sklearn trees evaluate on float32, so rows built in this dtype are used as-is
+FEATURE_DTYPE = np.float32
+
+
+class SymptomIndex:
+    """Maps symptom names to feature columns and back."""
+
+    def __init__(self, symptoms):
+        self.names = [str(symptom) for symptom in symptoms]
+        self.columns = {name: col for col, name in enumerate(self.names)}
+        # The version changes whenever the column order changes, so callers
+        # holding integer IDs can detect that they need to refresh them.
+        self.version = hashlib.sha1("\n".join(self.names).encode("utf-8")).hexdigest()[:12]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def column(self, name):
+        return self.columns.get(name)
+
+    def name(self, column):
+        return self.names[column]
+
+    def resolve(self, symptoms):
+        """Split symptom names into (columns, valid_symptoms, invalid_symptoms)."""
+        columns = []
+        valid_symptoms = []
+        invalid_symptoms = []
+        for symptom in symptoms:
+            col = self.columns.get(symptom)
+            if col is None:
+                invalid_symptoms.append(symptom)
+            else:
+                columns.append(col)
+                valid_symptoms.append(symptom)
+        return columns, valid_symptoms, invalid_symptoms
+
+    def resolve_ids(self, symptom_ids):
+        """Split integer IDs into (columns, valid_symptoms, invalid_ids)."""
+        columns = []
+        valid_symptoms = []
+        invalid_ids = []
+        n_symptoms = len(self.names)
+        for symptom_id in symptom_ids:
+            if 0 <= symptom_id < n_symptoms:
+                columns.append(symptom_id)
+                valid_symptoms.append(self.names[symptom_id])
+            else:
+                invalid_ids.append(str(symptom_id))
+        return columns, valid_symptoms, invalid_ids
+
+    def decode_bitmask(self, bitmask):
+        """
+        Decode a base64 packed bitmask into column IDs.
+
+        Bit i (little-endian within each byte) set means symptom ID i is present,
+        i.e. the mask is ``int.to_bytes(..., "little")`` of sum(1 << id).
+        """
+        try:
+            packed = base64.b64decode(bitmask, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError("Bitmask must be base64 encoded")
+
+        bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8), bitorder="little")
+        if bits[len(self.names):].any():
+            raise ValueError(f"Bitmask sets bits beyond the {len(self.names)} known symptoms")
+        return np.flatnonzero(bits[:len(self.names)]).tolist()
+
+    def encode(self, columns, out=None):
+        """
+        Build a contiguous (1, n_symptoms) feature row with the given columns set.
+
+        Pass a preallocated ``out`` row to reuse its memory.
+        """
+        if out is None:
+            out = np.zeros((1, len(self.names)), dtype=FEATURE_DTYPE)
+        else:
+            out.fill(0)
+        out[0, columns] = 1
+        return out
+
+    def encode_many(self, column_sets):
+        """Build an (n_rows, n_symptoms) feature matrix, one row per column set."""
+        out = np.zeros((len(column_sets), len(self.names)), dtype=FEATURE_DTYPE)
+        for row, columns in enumerate(column_sets):
+            out[row, columns] = 1
+        return out
+
+    def check_model(self, model):
+        """
+        Validate the model's feature names against this index once, at load time.
+
+        After this check predictions are made on bare NumPy rows, so sklearn's
+        per-call "X does not have valid feature names" warning is silenced.
+        """
+        feature_names = getattr(model, "feature_names_in_", None)
+        if feature_names is not None and list(feature_names) != self.names:
+            raise ValueError("Model feature names do not match the symptom index")
+        n_features = getattr(model, "n_features_in_", getattr(model, "n_features", len(self.names)))
+        if n_features != len(self.names):
+            raise ValueError(
+                f"Model expects {n_features} features, symptom index has {len(self.names)}"
+            )
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    def to_list(self):
+        return [{"id": col, "name": name} for col, name in enumerate(self.names)]
@@ -9,6 +9,8 @@ import json
 import os
 from collections import defaultdict
 
+from class_importance import class_conditional_importance, save_class_importance
+
 # Create models directory if it doesn't exist
 os.makedirs('models', exist_ok=True)
 
@@ -136,6 +138,8 @@ print(classification_report(y_test, y_pred))
 print("\nSaving model files...")
 joblib.dump(rf_model, 'models/random_forest_disease_model.pkl', compress=3)
 joblib.dump(label_encoder, 'models/label_encoder.pkl', compress=3)
+save_class_importance('models/class_importance.npz', class_conditional_importance(rf_model),
+                      label_encoder.classes_, feature_names)
 
 # Create and save symptoms.json with importance scores
 symptoms_importance = dict(zip(feature_names, rf_model.feature_importances_))
@@ -154,5 +158,6 @@ print("1. models/random_forest_disease_model.pkl")
 print("2. models/label_encoder.pkl")
 print("3. models/symptoms.json")
 print("4. models/model_metrics.json")
+print("5. models/class_importance.npz")
 
 print("\nModel training complete!") 
\ No newline at end of file
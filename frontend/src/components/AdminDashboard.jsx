@@ -2,6 +2,26 @@ import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import Navbar from './Navbar';
 
+const API_URL = 'http://localhost:8000';
+const PAGE_SIZE = 50;
+
+// Only the columns each table shows are requested
+const LIST_FIELDS = {
+  doctors: 'id,name,specialization,hospital,rating',
+  users: 'id,username,email,gender,created_at',
+  messages: 'id,message,created_at',
+  appointments: 'id,created_at,user,doctor,message,status',
+};
+
+// One page of an admin list: { items, next_cursor }
+const fetchPage = async (resource, cursor = null) => {
+  const params = new URLSearchParams({ limit: PAGE_SIZE, fields: LIST_FIELDS[resource] });
+  if (cursor !== null) params.set('cursor', cursor);
+  const response = await fetch(`${API_URL}/api/admin/${resource}?${params}`);
+  if (!response.ok) throw new Error(`Failed to fetch ${resource}`);
+  return response.json();
+};
+
 const AdminDashboard = () => {
   const navigate = useNavigate();
   const [doctors, setDoctors] = useState([]);
@@ -12,6 +32,8 @@ const AdminDashboard = () => {
     totalUsers: 0,
     totalDoctors: 0
   });
+  // next_cursor of each paginated admin list; null once everything is loaded
+  const [cursors, setCursors] = useState({});
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
 
@@ -26,39 +48,26 @@ const AdminDashboard = () => {
     const fetchData = async () => {
       try {
         setLoading(true);
-        // Fetch doctors
-        const doctorsResponse = await fetch('http://localhost:8000/api/admin/doctors');
-        if (!doctorsResponse.ok) throw new Error('Failed to fetch doctors');
-        const doctorsData = await doctorsResponse.json();
-        console.log('Doctors data:', doctorsData);
-        setDoctors(doctorsData);
-
-        // Fetch users
-        const usersResponse = await fetch('http://localhost:8000/api/admin/users');
-        if (!usersResponse.ok) throw new Error('Failed to fetch users');
-        const usersData = await usersResponse.json();
-        console.log('Users data:', usersData);
-        setUsers(usersData);
+        const [doctorsPage, usersPage, messagesPage, appointmentsPage] = await Promise.all(
+          ['doctors', 'users', 'messages', 'appointments'].map(resource => fetchPage(resource))
+        );
+        setDoctors(doctorsPage.items);
+        setUsers(usersPage.items);
+        setMessages(messagesPage.items);
+        setAppointments(appointmentsPage.items);
+        setCursors({
+          doctors: doctorsPage.next_cursor,
+          users: usersPage.next_cursor,
+          messages: messagesPage.next_cursor,
+          appointments: appointmentsPage.next_cursor,
+        });
 
         // Fetch stats
-        const statsResponse = await fetch('http://localhost:8000/api/admin/stats');
+        const statsResponse = await fetch(`${API_URL}/api/admin/stats`);
         if (!statsResponse.ok) throw new Error('Failed to fetch stats');
         const statsData = await statsResponse.json();
-        console.log('Stats data:', statsData);
         setStats(statsData);
 
-        // Fetch messages
-        const messagesResponse = await fetch('http://localhost:8000/api/admin/messages');
-        if (!messagesResponse.ok) throw new Error('Failed to fetch messages');
-        const messagesData = await messagesResponse.json();
-        setMessages(messagesData);
-
-        // Fetch appointments
-        const appointmentsResponse = await fetch('http://localhost:8000/api/admin/appointments');
-        if (!appointmentsResponse.ok) throw new Error('Failed to fetch appointments');
-        const appointmentsData = await appointmentsResponse.json();
-        setAppointments(appointmentsData);
-
       } catch (err) {
         console.error('Dashboard error:', err);
         setError('Failed to load dashboard data: ' + err.message);
@@ -70,6 +79,30 @@ const AdminDashboard = () => {
     fetchData();
   }, [navigate]);
 
+  // Append the next page of one admin list
+  const handleLoadMore = async (resource, setItems) => {
+    try {
+      const page = await fetchPage(resource, cursors[resource]);
+      setItems(items => [...items, ...page.items]);
+      setCursors(current => ({ ...current, [resource]: page.next_cursor }));
+    } catch (err) {
+      setError('Failed to load more ' + resource + ': ' + err.message);
+    }
+  };
+
+  const loadMoreButton = (resource, setItems) => (
+    cursors[resource] != null && (
+      <div className="mt-4 text-center">
+        <button
+          onClick={() => handleLoadMore(resource, setItems)}
+          className="text-blue-600 hover:text-blue-800"
+        >
+          Load more
+        </button>
+      </div>
+    )
+  );
+
   // Add doctor handler
   const handleAddDoctor = async () => {
     // Implementation for adding a new doctor
@@ -237,6 +270,7 @@ const AdminDashboard = () => {
                   </tbody>
                 </table>
               </div>
+              {loadMoreButton('appointments', setAppointments)}
             </div>
 
             {/* Messages Section */}
@@ -281,6 +315,7 @@ const AdminDashboard = () => {
                   </tbody>
                 </table>
               </div>
+              {loadMoreButton('messages', setMessages)}
             </div>
 
             {/* Doctors Management */}
@@ -334,6 +369,7 @@ const AdminDashboard = () => {
                   </tbody>
                 </table>
               </div>
+              {loadMoreButton('doctors', setDoctors)}
             </div>
 
             {/* Users List */}
@@ -371,6 +407,7 @@ const AdminDashboard = () => {
                   </tbody>
                 </table>
               </div>
+              {loadMoreButton('users', setUsers)}
             </div>
           </>
         )}
@@ -1,19 +1,43 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from utils import load_model, load_metrics, predict_top3, explain_with_gemini
+from utils import (
+    METRICS_PATH,
+    MODEL_PATH,
+    explain_with_gemini,
+    files_signature,
+    get_predictor,
+    load_metrics,
+    predict_top3,
+)
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+from dataset_cache import DATASETS, dataset_summary, read_page
 
 st.set_page_config(page_title="Smart Symptom Classifier", layout="wide")
+
+
+@st.cache_resource(max_entries=1)
+def evaluation_tables(signature):
+    """Confusion matrix and classification report frames, rebuilt when the model or metrics change."""
+    metrics = load_metrics()
+    classes = get_predictor().classes
+    confusion_matrix = pd.DataFrame(metrics["confusion_matrix"], index=classes, columns=classes)
+    report_df = (
+        pd.DataFrame(metrics["report"])
+        .transpose()[["precision", "recall", "f1-score"]]
+        .dropna()
+    )
+    return confusion_matrix, report_df
+
+
 tabs = st.tabs(["Prediction", "Dataset", "Model Evaluation"])
 
 with tabs[0]:
     st.title("Smart Symptom Classifier: Prediction")
 
-    model_bundle = load_model()
-    all_symptoms = model_bundle["symptoms"]
+    all_symptoms = get_predictor().symptoms
 
     st.markdown("**Select symptoms (one-hot format):**")
     symptoms_selected = st.multiselect("Symptoms", all_symptoms)
@@ -31,17 +55,7 @@ with tabs[0]:
                 )
 
             # Model explainability (Gemini)
-            metrics = load_metrics()
-            confusion_matrix = pd.DataFrame(
-                metrics["confusion_matrix"],
-                index=model_bundle["encoder"].classes_,
-                columns=model_bundle["encoder"].classes_,
-            )
-            report_df = (
-                pd.DataFrame(metrics["report"])
-                .transpose()[["precision", "recall", "f1-score"]]
-                .dropna()
-            )
+            confusion_matrix, report_df = evaluation_tables(files_signature(MODEL_PATH, METRICS_PATH))
             st.subheader("Model Reasoning (via Gemini API)")
             reason = explain_with_gemini(
                 symptoms_selected, preds, confusion_matrix, report_df
@@ -50,19 +64,39 @@ with tabs[0]:
 
 with tabs[1]:
     st.title("Dataset")
-    st.markdown("**Training Dataset**")
-    train_df = pd.read_csv("data/Training.csv")
-    st.dataframe(train_df, use_container_width=True)
-    st.markdown("**Testing Dataset**")
-    test_df = pd.read_csv("data/Testing.csv")
-    st.dataframe(test_df, use_container_width=True)
+    dataset_name = st.radio("Dataset", list(DATASETS), horizontal=True)
+    csv_path = DATASETS[dataset_name]
+    summary = dataset_summary(csv_path)
+    st.markdown(
+        f"**{dataset_name} Dataset:** {summary['rows']} rows, "
+        f"{len(summary['symptom_columns'])} symptom columns, {len(summary['class_counts'])} diseases"
+    )
+
+    if not st.checkbox("Browse rows"):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("Cases per Disease")
+            class_counts = pd.Series(summary["class_counts"], name="cases").sort_values(ascending=False)
+            st.dataframe(class_counts, use_container_width=True)
+        with col2:
+            st.subheader("Symptom Prevalence")
+            prevalence = pd.Series(summary["symptom_prevalence"], name="share of cases").sort_values(ascending=False)
+            st.dataframe(prevalence, use_container_width=True)
+    else:
+        # Only the selected page and columns are read from the columnar copy
+        columns = st.multiselect(
+            "Symptom columns", summary["symptom_columns"], default=summary["symptom_columns"][:10]
+        )
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 200], index=1)
+        n_pages = max(1, -(-summary["rows"] // page_size))
+        page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1)
+        st.dataframe(read_page(csv_path, page - 1, page_size, columns), use_container_width=True)
 
 with tabs[2]:
     st.title("Model Evaluation")
 
     metrics = load_metrics()
-    model_bundle = load_model()
-    le = model_bundle["encoder"]
+    predictor = get_predictor()
 
     # Confusion matrix
     st.subheader("Confusion Matrix")
@@ -73,8 +107,8 @@ with tabs[2]:
         annot=False,
         fmt="d",
         cmap="Blues",
-        xticklabels=le.classes_,
-        yticklabels=le.classes_,
+        xticklabels=predictor.classes,
+        yticklabels=predictor.classes,
         ax=ax1,
     )
     ax1.set_xlabel("Predicted")
@@ -84,7 +118,7 @@ with tabs[2]:
     # Feature importances
     st.subheader("Top 10 Symptom Importances")
     importances = metrics["feature_importances"]
-    symptoms = model_bundle["symptoms"]
+    symptoms = predictor.symptoms
     indices = np.argsort(importances)[-10:][::-1]
     fig2, ax2 = plt.subplots(figsize=(8, 6))
     ax2.barh(range(10), importances[indices], align="center")
@@ -95,11 +129,7 @@ with tabs[2]:
 
     # Classification report
     st.subheader("Classification Report (Test)")
-    report_df = (
-        pd.DataFrame(metrics["report"])
-        .transpose()[["precision", "recall", "f1-score"]]
-        .dropna()
-    )
+    _, report_df = evaluation_tables(files_signature(MODEL_PATH, METRICS_PATH))
     st.dataframe(report_df)
 
     # Symptom-disease correlation (show image if exists)
@@ -0,0 +1,78 @@
+"""
+Columnar copies of the CSV datasets for the Dataset tab.
+
+Each CSV is converted once to an uncompressed Feather (Arrow IPC) file under
+data/cache/, together with a JSON summary (row count, class counts, symptom
+prevalence). The copy is rebuilt when the CSV's mtime or size changes. Pages
+are read from the memory-mapped Feather file with only the requested columns,
+so a page costs its own rows and columns, not the whole table.
+"""
+import json
+import os
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from utils import cached_resource, files_signature
+
+DATASETS = {"Training": "data/Training.csv", "Testing": "data/Testing.csv"}
+CACHE_DIR = os.path.join("data", "cache")
+LABEL_COLUMN = "prognosis"
+
+
+def _cache_paths(csv_path):
+    base = os.path.join(CACHE_DIR, os.path.splitext(os.path.basename(csv_path))[0])
+    return base + ".feather", base + ".summary.json"
+
+
+def _convert(csv_path):
+    """Write the Feather copy and summary of a CSV; returns the summary."""
+    table_path, summary_path = _cache_paths(csv_path)
+    df = pd.read_csv(csv_path)
+    # pandas names the empty trailing column of the Kaggle CSVs "Unnamed: N"
+    df = df.loc[:, ~df.columns.str.startswith("Unnamed")]
+    symptom_columns = [col for col in df.columns if col != LABEL_COLUMN]
+
+    summary = {
+        "source_signature": list(files_signature(csv_path)[0]),
+        "rows": len(df),
+        "symptom_columns": symptom_columns,
+        "class_counts": {str(k): int(v) for k, v in df[LABEL_COLUMN].value_counts().items()},
+        "symptom_prevalence": {col: float(df[col].mean()) for col in symptom_columns},
+    }
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Uncompressed, so reads can memory-map it; written aside and renamed into place
+    feather.write_feather(df, table_path + ".tmp", compression="uncompressed")
+    os.replace(table_path + ".tmp", table_path)
+    with open(summary_path + ".tmp", "w") as f:
+        json.dump(summary, f)
+    os.replace(summary_path + ".tmp", summary_path)
+    return summary
+
+
+def _load_summary(csv_path):
+    table_path, summary_path = _cache_paths(csv_path)
+    if os.path.exists(table_path) and os.path.exists(summary_path):
+        with open(summary_path) as f:
+            summary = json.load(f)
+        if tuple(summary["source_signature"]) == files_signature(csv_path)[0]:
+            return summary
+    print(f"Building columnar copy of {csv_path}...")
+    return _convert(csv_path)
+
+
+def dataset_summary(csv_path):
+    """Row count, symptom columns, class counts and symptom prevalence of a dataset."""
+    return cached_resource(("dataset", csv_path), [csv_path], lambda: _load_summary(csv_path))
+
+
+def read_page(csv_path, page, page_size, columns):
+    """Rows [page * page_size, (page + 1) * page_size) of the given columns, plus the label."""
+    dataset_summary(csv_path)
+    table_path, _ = _cache_paths(csv_path)
+    columns = [LABEL_COLUMN] + [col for col in columns if col != LABEL_COLUMN]
+    table = feather.read_table(table_path, columns=columns, memory_map=True)
+    page_df = table.slice(page * page_size, page_size).to_pandas()
+    page_df.index = range(page * page_size, page * page_size + len(page_df))
+    return page_df
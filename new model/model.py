@@ -7,6 +7,15 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import joblib
 import os
+import sys
+
+# The class-conditional importance artifact is shared with the backend server
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from class_importance import (
+    CLASS_IMPORTANCE_FILE,
+    class_conditional_importance,
+    save_class_importance,
+)
 
 
 def train_and_save_model(
@@ -98,6 +107,14 @@ def train_and_save_model(
     )
     print("Model and encoder saved!")
 
+    # Per-disease symptom importance, loaded by the server instead of being
+    # recomputed at startup
+    importance_path = os.path.join(os.path.dirname(model_save_path), CLASS_IMPORTANCE_FILE)
+    save_class_importance(
+        importance_path, class_conditional_importance(clf), le.classes_, X.columns.tolist()
+    )
+    print(f"Class-conditional importance saved to {importance_path}")
+
 
 if __name__ == "__main__":
     # Ensure app directory exists
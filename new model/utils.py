@@ -1,38 +1,80 @@
 import joblib
-import numpy as np
 import os
-import pandas as pd
+import sys
+import threading
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+# Model loading, symptom encoding and top-k are shared with the backend API
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from cache import TTLCache
+from class_importance import CLASS_IMPORTANCE_FILE
+from predictor import Predictor
+
 load_dotenv()
 
 MODEL_PATH = "app/disease_model.pkl"
 METRICS_PATH = "app/model_metrics.pkl"
+CLASS_IMPORTANCE_PATH = os.path.join(os.path.dirname(MODEL_PATH), CLASS_IMPORTANCE_FILE)
+
+# Loaded artifacts, shared by every Streamlit session in this process:
+# key -> (file signature, value), each loaded under its own lock
+_resources = {}
+_resource_locks = {}
+_resource_locks_lock = threading.Lock()
+
+
+def files_signature(*paths):
+    """(mtime, size) of each existing file; changes whenever one is replaced."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            signature.append(None)
+            continue
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def cached_resource(key, paths, loader):
+    """loader()'s result, reused until one of paths changes on disk."""
+    signature = files_signature(*paths)
+    with _resource_locks_lock:
+        lock = _resource_locks.setdefault(key, threading.Lock())
+    # Concurrent sessions wait for one load of the same key, not for other keys
+    with lock:
+        entry = _resources.get(key)
+        if entry is None or entry[0] != signature:
+            entry = (signature, loader())
+            _resources[key] = entry
+        return entry[1]
+
 
+def load_metrics():
+    """The saved evaluation metrics; shared between sessions, so callers must not modify them."""
+    return cached_resource("metrics", [METRICS_PATH], lambda: joblib.load(METRICS_PATH))
 
-def load_model():
-    return joblib.load(MODEL_PATH)
 
+def get_predictor():
+    """
+    The shared Predictor for MODEL_PATH, reloaded when the model files change.
 
-def load_metrics():
-    return joblib.load(METRICS_PATH)
+    Its symptoms and classes are the bundle's symptoms and encoder classes, so
+    the app reads them from here rather than unpickling the bundle again.
+    """
+    return cached_resource(
+        "predictor",
+        [MODEL_PATH, CLASS_IMPORTANCE_PATH],
+        lambda: Predictor.load(MODEL_PATH, cache=TTLCache(max_entries=1024, ttl_seconds=None), lazy=True),
+    )
 
 
 def predict_top3(symptoms_selected):
-    model_bundle = load_model()
-    clf = model_bundle["model"]
-    le = model_bundle["encoder"]
-    all_symptoms = model_bundle["symptoms"]
-    # Encode input as one-hot
-    input_features = np.zeros(len(all_symptoms))
-    for idx, sym in enumerate(all_symptoms):
-        if sym in symptoms_selected:
-            input_features[idx] = 1
-    probs = clf.predict_proba([input_features])[0]
-    top_idxs = np.argsort(probs)[::-1][:3]
-    preds = [(le.inverse_transform([i])[0], probs[i]) for i in top_idxs]
-    return preds, input_features
+    predictor = get_predictor()
+    preds = predictor.top_k([symptoms_selected], k=3)[0]
+    input_features = predictor.symptom_index.encode(predictor.symptom_index.resolve(symptoms_selected)[0])
+    return preds, input_features[0]
 
 
 def explain_with_gemini(symptoms_selected, preds, confusion_matrix=None, report_df=None):